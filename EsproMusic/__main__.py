@@ -6,26 +6,33 @@ from pytgcalls.exceptions import NoActiveGroupCall
 
 import config
 from EsproMusic import LOGGER, app, userbot
+from EsproMusic.core import mediacache
 from EsproMusic.core.call import Loy
+from EsproMusic.core.http import close_session
+from EsproMusic.core.mongo import ensure_indexes
 from EsproMusic.misc import sudo
 from EsproMusic.plugins import ALL_MODULES
-from EsproMusic.utils.database import get_banned_users, get_gbanned
+from EsproMusic.utils.database import (
+    get_banned_users,
+    get_gbanned,
+    load_served,
+    preload_settings,
+)
 from config import BANNED_USERS
 
 
 async def init():
-    if (
-        not config.STRING1
-        and not config.STRING2
-        and not config.STRING3
-        and not config.STRING4
-        and not config.STRING5
-    ):
+    if not config.STRING_SESSIONS:
         LOGGER(__name__).error("Assistant client variables not defined, exiting...")
         exit()
 
     await sudo()
 
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        LOGGER("EsproMusic").warning(f"Failed to ensure Mongo indexes: {e}")
+
     try:
         users = await get_gbanned()
         for user_id in users:
@@ -36,6 +43,22 @@ async def init():
     except Exception as e:
         LOGGER("EsproMusic").warning(f"Failed to load banned users: {e}")
 
+    try:
+        await load_served()
+    except Exception as e:
+        LOGGER("EsproMusic").warning(f"Failed to load served users and chats: {e}")
+
+    try:
+        mediacache.load()
+    except Exception as e:
+        LOGGER("EsproMusic").warning(f"Failed to load media cache index: {e}")
+
+    if config.SETTINGS_PRELOAD_LIMIT:
+        try:
+            await preload_settings(config.SETTINGS_PRELOAD_LIMIT)
+        except Exception as e:
+            LOGGER("EsproMusic").warning(f"Failed to preload chat settings: {e}")
+
     await app.start()
 
     # ✅ Fixed import line + safe import loop
@@ -72,6 +95,8 @@ async def init():
 
     await app.stop()
     await userbot.stop()
+    await close_session()
+    mediacache.save(force=True)
     LOGGER("EsproMusic").info("🛑 Stopping Espro Music Bot...")
 
 
@@ -1,6 +1,6 @@
 import asyncio
 import os
-from datetime import datetime, timedelta
+import time
 from typing import Union
 
 from pyrogram import Client
@@ -19,9 +19,12 @@ from pytgcalls.types.stream import StreamAudioEnded
 import config
 from EsproMusic import LOGGER, YouTube, app
 from EsproMusic.misc import db
+from EsproMusic.platforms.Youtube import stream_source, wait_stream
 from EsproMusic.utils.database import (
     add_active_chat,
     add_active_video_chat,
+    get_assistant_number,
+    get_client,
     get_lang,
     get_loop,
     group_assistant,
@@ -34,80 +37,62 @@ from EsproMusic.utils.database import (
 from EsproMusic.utils.exceptions import AssistantErr
 from EsproMusic.utils.formatters import check_duration, seconds_to_min, speed_converter
 from EsproMusic.utils.inline.play import stream_markup
-from EsproMusic.utils.stream.autoclear import auto_clean
+from EsproMusic.utils.scheduler import cancel, schedule
+from EsproMusic.utils.stream.autoclear import auto_clean, clear_queue, set_speed_path
+from EsproMusic.utils.stream.clock import (
+    get_played,
+    pause_clock,
+    resume_clock,
+    set_played,
+    start_clock,
+)
+from EsproMusic.utils.stream.prefetch import (
+    is_prefetched,
+    schedule_prefetch,
+    wait_prefetch,
+)
+from EsproMusic.utils.stream.progress import schedule_progress
 from EsproMusic.utils.thumbnails import get_thumb
 from strings import get_string
 
-autoend = {}
-counter = {}
-
-
 async def _clear_(chat_id):
-    db[chat_id] = []
+    await clear_queue(chat_id)
+    schedule_prefetch(chat_id)
+    schedule_progress(chat_id)
+    cancel("autoend", chat_id)
     await remove_active_video_chat(chat_id)
     await remove_active_chat(chat_id)
+    number = await get_assistant_number(chat_id)
+    if config.AUTO_LEAVING_ASSISTANT and number:
+        schedule("leave", (number, chat_id), config.AUTO_LEAVE_TIME)
 
 
 class Call(PyTgCalls):
     def __init__(self):
-        self.userbot1 = Client(
-            name="EsproAss1",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING1),
-        )
-        self.one = PyTgCalls(
-            self.userbot1,
-            cache_duration=100,
-        )
-        self.userbot2 = Client(
-            name="EsproAss2",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING2),
-        )
-        self.two = PyTgCalls(
-            self.userbot2,
-            cache_duration=100,
-        )
-        self.userbot3 = Client(
-            name="EsproAss3",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING3),
-        )
-        self.three = PyTgCalls(
-            self.userbot3,
-            cache_duration=100,
-        )
-        self.userbot4 = Client(
-            name="EsproAss4",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING4),
-        )
-        self.four = PyTgCalls(
-            self.userbot4,
-            cache_duration=100,
-        )
-        self.userbot5 = Client(
-            name="EsproAss5",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING5),
-        )
-        self.five = PyTgCalls(
-            self.userbot5,
-            cache_duration=100,
-        )
+        self.clients = {
+            number: PyTgCalls(
+                Client(
+                    name=f"EsproAss{number}",
+                    api_id=config.API_ID,
+                    api_hash=config.API_HASH,
+                    session_string=str(session),
+                ),
+                cache_duration=100,
+            )
+            for number, session in config.STRING_SESSIONS.items()
+        }
 
     async def pause_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
         await assistant.pause_stream(chat_id)
+        pause_clock(chat_id)
+        schedule_progress(chat_id)
 
     async def resume_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
         await assistant.resume_stream(chat_id)
+        resume_clock(chat_id)
+        schedule_progress(chat_id)
 
     async def stop_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
@@ -118,31 +103,11 @@ class Call(PyTgCalls):
             pass
 
     async def stop_stream_force(self, chat_id: int):
-        try:
-            if config.STRING1:
-                await self.one.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING2:
-                await self.two.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING3:
-                await self.three.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING4:
-                await self.four.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING5:
-                await self.five.leave_group_call(chat_id)
-        except:
-            pass
+        for assistant in self.clients.values():
+            try:
+                await assistant.leave_group_call(chat_id)
+            except:
+                pass
         try:
             await _clear_(chat_id)
         except:
@@ -150,6 +115,7 @@ class Call(PyTgCalls):
 
     async def speedup_stream(self, chat_id: int, file_path, speed, playing):
         assistant = await group_assistant(self, chat_id)
+        await wait_stream(file_path)
         if str(speed) != str("1.0"):
             base = os.path.basename(file_path)
             chatdir = os.path.join(os.getcwd(), "playback", str(speed))
@@ -186,7 +152,7 @@ class Call(PyTgCalls):
             out = file_path
         dur = await asyncio.get_event_loop().run_in_executor(None, check_duration, out)
         dur = int(dur)
-        played, con_seconds = speed_converter(playing[0]["played"], speed)
+        played, con_seconds = speed_converter(get_played(playing[0]), speed)
         duration = seconds_to_min(dur)
         stream = (
             AudioVideoPiped(
@@ -211,17 +177,18 @@ class Call(PyTgCalls):
             if not exis:
                 db[chat_id][0]["old_dur"] = db[chat_id][0]["dur"]
                 db[chat_id][0]["old_second"] = db[chat_id][0]["seconds"]
-            db[chat_id][0]["played"] = con_seconds
+            set_played(db[chat_id][0], con_seconds)
             db[chat_id][0]["dur"] = duration
             db[chat_id][0]["seconds"] = dur
-            db[chat_id][0]["speed_path"] = out
+            set_speed_path(db[chat_id][0], out)
             db[chat_id][0]["speed"] = speed
+            schedule_progress(chat_id)
 
     async def force_stop_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
         try:
             check = db.get(chat_id)
-            check.pop(0)
+            await auto_clean(check.pop(0))
         except:
             pass
         await remove_active_video_chat(chat_id)
@@ -239,14 +206,18 @@ class Call(PyTgCalls):
         image: Union[bool, str] = None,
     ):
         assistant = await group_assistant(self, chat_id)
+        link, headers = stream_source(link)
         if video:
             stream = AudioVideoPiped(
                 link,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
+                headers=headers,
             )
         else:
-            stream = AudioPiped(link, audio_parameters=HighQualityAudio())
+            stream = AudioPiped(
+                link, audio_parameters=HighQualityAudio(), headers=headers
+            )
         await assistant.change_stream(
             chat_id,
             stream,
@@ -254,17 +225,20 @@ class Call(PyTgCalls):
 
     async def seek_stream(self, chat_id, file_path, to_seek, duration, mode):
         assistant = await group_assistant(self, chat_id)
+        file_path, headers = stream_source(file_path)
         stream = (
             AudioVideoPiped(
                 file_path,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
+                headers=headers,
                 additional_ffmpeg_parameters=f"-ss {to_seek} -to {duration}",
             )
             if mode == "video"
             else AudioPiped(
                 file_path,
                 audio_parameters=HighQualityAudio(),
+                headers=headers,
                 additional_ffmpeg_parameters=f"-ss {to_seek} -to {duration}",
             )
         )
@@ -291,11 +265,13 @@ class Call(PyTgCalls):
         assistant = await group_assistant(self, chat_id)
         language = await get_lang(chat_id)
         _ = get_string(language)
+        link, headers = stream_source(link)
         if video:
             stream = AudioVideoPiped(
                 link,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
+                headers=headers,
             )
         else:
             stream = (
@@ -303,9 +279,10 @@ class Call(PyTgCalls):
                     link,
                     audio_parameters=HighQualityAudio(),
                     video_parameters=MediumQualityVideo(),
+                    headers=headers,
                 )
                 if video
-                else AudioPiped(link, audio_parameters=HighQualityAudio())
+                else AudioPiped(link, audio_parameters=HighQualityAudio(), headers=headers)
             )
         try:
             await assistant.join_group_call(
@@ -320,14 +297,15 @@ class Call(PyTgCalls):
         except TelegramServerError:
             raise AssistantErr(_["call_10"])
         await add_active_chat(chat_id)
+        cancel("leave", (await get_assistant_number(chat_id), chat_id))
         await Music_on(chat_id)
         if video:
             await add_active_video_chat(chat_id)
+        schedule("admins", chat_id, 0)
         if await is_autoend():
-            counter[chat_id] = {}
             users = len(await assistant.get_participants(chat_id))
             if users == 1:
-                autoend[chat_id] = datetime.now() + timedelta(minutes=1)
+                schedule("autoend", chat_id, 60)
 
     async def change_stream(self, client, chat_id):
         check = db.get(chat_id)
@@ -350,6 +328,7 @@ class Call(PyTgCalls):
             except:
                 return
         else:
+            schedule_prefetch(chat_id)
             queued = check[0]["file"]
             language = await get_lang(chat_id)
             _ = get_string(language)
@@ -358,12 +337,13 @@ class Call(PyTgCalls):
             original_chat_id = check[0]["chat_id"]
             streamtype = check[0]["streamtype"]
             videoid = check[0]["vidid"]
-            db[chat_id][0]["played"] = 0
+            start_clock(db[chat_id][0])
+            schedule_progress(chat_id)
             exis = (check[0]).get("old_dur")
             if exis:
                 db[chat_id][0]["dur"] = exis
                 db[chat_id][0]["seconds"] = check[0]["old_second"]
-                db[chat_id][0]["speed_path"] = None
+                set_speed_path(db[chat_id][0], None)
                 db[chat_id][0]["speed"] = 1.0
             video = True if str(streamtype) == "video" else False
             if "live_" in queued:
@@ -407,15 +387,21 @@ class Call(PyTgCalls):
                 db[chat_id][0]["mystic"] = run
                 db[chat_id][0]["markup"] = "tg"
             elif "vid_" in queued:
-                mystic = await app.send_message(original_chat_id, _["call_7"])
+                mystic = None
+                if not is_prefetched(videoid, video):
+                    mystic = await app.send_message(original_chat_id, _["call_7"])
+                await wait_prefetch(videoid, video)
                 try:
                     file_path, direct = await YouTube.download(
                         videoid,
                         mystic,
                         videoid=True,
                         video=True if str(streamtype) == "video" else False,
+                        chat_id=chat_id,
                     )
                 except:
+                    if not mystic:
+                        return await app.send_message(original_chat_id, _["call_6"])
                     return await mystic.edit_text(
                         _["call_6"], disable_web_page_preview=True
                     )
@@ -439,7 +425,8 @@ class Call(PyTgCalls):
                     )
                 img = await get_thumb(videoid)
                 button = stream_markup(_, chat_id)
-                await mystic.delete()
+                if mystic:
+                    await mystic.delete()
                 run = await app.send_photo(
                     chat_id=original_chat_id,
                     photo=img,
@@ -480,16 +467,19 @@ class Call(PyTgCalls):
                 db[chat_id][0]["mystic"] = run
                 db[chat_id][0]["markup"] = "tg"
             else:
+                source, headers = stream_source(queued)
                 if video:
                     stream = AudioVideoPiped(
-                        queued,
+                        source,
                         audio_parameters=HighQualityAudio(),
                         video_parameters=MediumQualityVideo(),
+                        headers=headers,
                     )
                 else:
                     stream = AudioPiped(
-                        queued,
+                        source,
                         audio_parameters=HighQualityAudio(),
+                        headers=headers,
                     )
                 try:
                     await client.change_stream(chat_id, stream)
@@ -542,60 +532,64 @@ class Call(PyTgCalls):
                     db[chat_id][0]["markup"] = "stream"
 
     async def ping(self):
-        pings = []
-        if config.STRING1:
-            pings.append(await self.one.ping)
-        if config.STRING2:
-            pings.append(await self.two.ping)
-        if config.STRING3:
-            pings.append(await self.three.ping)
-        if config.STRING4:
-            pings.append(await self.four.ping)
-        if config.STRING5:
-            pings.append(await self.five.ping)
+        from EsproMusic.core.userbot import assistants
+
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.clients[number].ping, config.ASSISTANT_PING_TIMEOUT)
+                for number in assistants
+            ),
+            return_exceptions=True,
+        )
+        pings = [ping for ping in results if not isinstance(ping, BaseException)]
+        if not pings:
+            return "0"
         return str(round(sum(pings) / len(pings), 3))
 
+    async def _start_client(self, number: int):
+        start = time.monotonic()
+        await self.clients[number].start()
+        return time.monotonic() - start
+
     async def start(self):
+        from EsproMusic.core.userbot import assistantids, assistants
+
         LOGGER(__name__).info("Starting PyTgCalls Client...\n")
-        if config.STRING1:
-            await self.one.start()
-        if config.STRING2:
-            await self.two.start()
-        if config.STRING3:
-            await self.three.start()
-        if config.STRING4:
-            await self.four.start()
-        if config.STRING5:
-            await self.five.start()
+        numbers = list(assistants)
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(self._start_client(number), config.ASSISTANT_START_TIMEOUT)
+                for number in numbers
+            ),
+            return_exceptions=True,
+        )
+        for number, result in zip(numbers, results):
+            if isinstance(result, BaseException):
+                # Keep new chats away from an assistant that can not stream.
+                assistants.remove(number)
+                client = await get_client(number)
+                if client.id in assistantids:
+                    assistantids.remove(client.id)
+                LOGGER(__name__).error(
+                    f"PyTgCalls Client {number} failed to start: {type(result).__name__}"
+                )
+            else:
+                LOGGER(__name__).info(f"PyTgCalls Client {number} Started in {result:.2f}s")
 
     async def decorators(self):
-        @self.one.on_kicked()
-        @self.two.on_kicked()
-        @self.three.on_kicked()
-        @self.four.on_kicked()
-        @self.five.on_kicked()
-        @self.one.on_closed_voice_chat()
-        @self.two.on_closed_voice_chat()
-        @self.three.on_closed_voice_chat()
-        @self.four.on_closed_voice_chat()
-        @self.five.on_closed_voice_chat()
-        @self.one.on_left()
-        @self.two.on_left()
-        @self.three.on_left()
-        @self.four.on_left()
-        @self.five.on_left()
         async def stream_services_handler(_, chat_id: int):
             await self.stop_stream(chat_id)
 
-        @self.one.on_stream_end()
-        @self.two.on_stream_end()
-        @self.three.on_stream_end()
-        @self.four.on_stream_end()
-        @self.five.on_stream_end()
         async def stream_end_handler1(client, update: Update):
             if not isinstance(update, StreamAudioEnded):
                 return
             await self.change_stream(client, update.chat_id)
 
+        for assistant in self.clients.values():
+            assistant.on_kicked()(stream_services_handler)
+            assistant.on_closed_voice_chat()(stream_services_handler)
+            assistant.on_left()(stream_services_handler)
+            assistant.on_stream_end()(stream_end_handler1)
+
 
 Loy = Call()
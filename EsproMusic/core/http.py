@@ -0,0 +1,31 @@
+import aiohttp
+
+import config
+
+from ..logging import LOGGER
+
+_session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=config.HTTP_POOL_LIMIT,
+                limit_per_host=config.HTTP_POOL_PER_HOST,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            ),
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        try:
+            await _session.close()
+        except Exception as e:
+            LOGGER(__name__).error(f"Error closing HTTP session: {e}")
+    _session = None
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+import config
+
+from ..logging import LOGGER
+
+CACHE_DIR = os.path.realpath(config.DOWNLOADS_DIR)
+INDEX_PATH = os.path.join(CACHE_DIR, ".index.json")
+
+# file name -> [size, last access], least recently used first
+entries = OrderedDict()
+stats = {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0}
+_saved = 0.0
+
+
+def _name(path):
+    path = os.path.realpath(str(path))
+    if os.path.dirname(path) != CACHE_DIR:
+        return None
+    return os.path.basename(path)
+
+
+def _pinned() -> set:
+    from EsproMusic.misc import db
+    from EsproMusic.platforms.Youtube import media_path
+
+    names = set()
+    for queue in list(db.values()):
+        for track in queue or []:
+            path = track.get("file", "")
+            # Queued YouTube tracks only name their download by video id
+            if path.startswith("vid_"):
+                path = media_path(track["vidid"], track["streamtype"] == "video")
+            name = _name(path)
+            if name:
+                names.add(name)
+    return names
+
+
+def cached_bytes() -> int:
+    return sum(size for size, _ in entries.values())
+
+
+def cache_stats() -> dict:
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "files": len(entries),
+        "bytes": cached_bytes(),
+        "hit_ratio": stats["hits"] / lookups if lookups else 0.0,
+    }
+
+
+def is_cached(path) -> bool:
+    return _name(path) in entries
+
+
+def _over_quota(size: int) -> bool:
+    if config.MEDIA_CACHE_FILES and len(entries) > config.MEDIA_CACHE_FILES:
+        return True
+    return bool(config.MEDIA_CACHE_SIZE) and size > config.MEDIA_CACHE_SIZE * 1024 * 1024
+
+
+def evict(keep=None):
+    size = cached_bytes()
+    if not _over_quota(size):
+        return
+    pinned = _pinned()
+    for name in list(entries):
+        if not _over_quota(size):
+            break
+        if name in pinned or name == keep:
+            continue
+        freed = entries.pop(name)[0]
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            LOGGER(__name__).warning(f"Could not evict {name}: {e}")
+            continue
+        size -= freed
+        stats["evictions"] += 1
+        stats["evicted_bytes"] += freed
+    save()
+
+
+def hit(path):
+    name = _name(path)
+    if name is None:
+        return
+    if name not in entries:
+        return admit(path, miss=False)
+    stats["hits"] += 1
+    entries[name][1] = time.time()
+    entries.move_to_end(name)
+    save()
+
+
+def admit(path, miss: bool = True):
+    name = _name(path)
+    if name is None:
+        return
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    if miss:
+        stats["misses"] += 1
+    entries[name] = [size, time.time()]
+    entries.move_to_end(name)
+    # The file was fetched for someone who has not queued it yet
+    evict(keep=name)
+
+
+def save(force: bool = False):
+    global _saved
+    if not force and time.monotonic() - _saved < 60:
+        return
+    _saved = time.monotonic()
+    tmp = f"{INDEX_PATH}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump({"entries": list(entries.items()), "stats": stats}, f)
+        os.replace(tmp, INDEX_PATH)
+    except OSError as e:
+        LOGGER(__name__).warning(f"Failed to save media cache index: {e}")
+        return
+    LOGGER(__name__).debug(f"Media cache: {cache_stats()}")
+
+
+def load():
+    try:
+        with open(INDEX_PATH) as f:
+            data = json.load(f)
+        index = OrderedDict((name, entry) for name, entry in data.get("entries", []))
+        stats.update(data.get("stats", {}))
+    except FileNotFoundError:
+        index = OrderedDict()
+    except (OSError, ValueError) as e:
+        LOGGER(__name__).warning(f"Ignoring unreadable media cache index: {e}")
+        index = OrderedDict()
+
+    # Files the index does not know about (crashes, older versions) are adopted
+    # by modification time; partial downloads untouched for a day are dropped.
+    entries.clear()
+    found = {}
+    now = time.time()
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.is_file() or entry.path.startswith(INDEX_PATH):
+            continue
+        info = entry.stat()
+        if entry.name.endswith(".part"):
+            if now - info.st_mtime > 86400:
+                os.remove(entry.path)
+            continue
+        found[entry.name] = [info.st_size, info.st_mtime]
+    for name, (size, accessed) in sorted(found.items(), key=lambda item: item[1][1]):
+        if name not in index:
+            entries[name] = [size, accessed]
+    for name, (_, accessed) in index.items():
+        if name in found:
+            entries[name] = [found[name][0], accessed]
+
+    evict()
+    save(force=True)
+    LOGGER(__name__).info(
+        f"Media cache holds {len(entries)} files, {cached_bytes() // (1024 * 1024)} MB"
+    )
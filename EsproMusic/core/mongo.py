@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
 
-from config import MONGO_DB_URI
+from config import MONGO_DB_URI, YT_CACHE_PERSIST_TTL
 
 from ..logging import LOGGER
 
@@ -12,3 +13,47 @@ try:
 except:
     LOGGER(__name__).error("Failed to connect to your Mongo Database.")
     exit()
+
+
+INDEXES = {
+    "adminauth": "chat_id",
+    "assistants": "chat_id",
+    "authuser": "chat_id",
+    "autoend": "chat_id",
+    "blacklistChat": "chat_id",
+    "blockedusers": "user_id",
+    "chats": "chat_id",
+    "cplaymode": "chat_id",
+    "gban": "user_id",
+    "language": "chat_id",
+    "onoffper": "on_off",
+    "playmode": "chat_id",
+    "playtypedb": "chat_id",
+    "skipmode": "chat_id",
+    "sudoers": "sudo",
+    "tgusersdb": "user_id",
+    "upcount": "chat_id",
+    "ytmeta": "key",
+}
+
+
+async def ensure_indexes():
+    for collection, key in INDEXES.items():
+        try:
+            await mongodb[collection].create_index(key, unique=True)
+        except PyMongoError as e:
+            # Old duplicate documents block a unique index, fall back to a plain one.
+            LOGGER(__name__).warning(
+                f"Unique index on {collection}.{key} not created: {e}"
+            )
+            try:
+                await mongodb[collection].create_index(key)
+            except PyMongoError:
+                pass
+    try:
+        await mongodb.ytmeta.create_index(
+            "updated", expireAfterSeconds=YT_CACHE_PERSIST_TTL
+        )
+    except PyMongoError as e:
+        LOGGER(__name__).warning(f"TTL index on ytmeta.updated not created: {e}")
+    LOGGER(__name__).info("Mongo Indexes Ensured.")
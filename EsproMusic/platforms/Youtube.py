@@ -1,33 +1,60 @@
 import asyncio
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 import yt_dlp
 from pyrogram.enums import MessageEntityType
 from pyrogram.types import Message
-from py_yt import VideosSearch
 from EsproMusic.utils.formatters import time_to_seconds
 import aiohttp
 from EsproMusic import LOGGER
+from EsproMusic.core import mediacache
+from EsproMusic.core.http import get_session
+from EsproMusic.platforms._httpx import (
+    HttpxClient,
+    IncompleteDownloadError,
+    part_path,
+    resume_point,
+)
+from EsproMusic.platforms._scheduler import PRIORITY_PLAY, DownloadScheduler
+from EsproMusic.platforms._search import search
+from EsproMusic.platforms._segmented import (
+    SegmentError,
+    accepts_ranges,
+    download_segments,
+)
+from EsproMusic.utils.cache import TTLCache
+import config
 from typing import Union
 
 YOUR_API_URL = None
 FALLBACK_API_URL = "https://shrutibots.site"
 
+downloads = DownloadScheduler(config.DOWNLOAD_WORKERS)
+inflight = {}
+# Cache path -> (stream url, request headers, download task) while a track plays remotely
+streaming = {}
+# playlist id -> (video ids fetched so far, playlist entries read, whether that is all of them)
+playlists = TTLCache(config.PLAYLIST_CACHE_SIZE, config.PLAYLIST_CACHE_TTL)
+playlist_pool = ThreadPoolExecutor(
+    max_workers=config.PLAYLIST_WORKERS, thread_name_prefix="playlist"
+)
+
 async def load_api_url():
     global YOUR_API_URL
     logger = LOGGER("EsproMusic.platforms.Youtube.py")
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://pastebin.com/raw/rLsBhAQa", timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    YOUR_API_URL = content.strip()
-                    logger.info("API URL loaded successfully")
-                else:
-                    YOUR_API_URL = FALLBACK_API_URL
-                    logger.info("Using fallback API URL")
+        session = get_session()
+        async with session.get("https://pastebin.com/raw/rLsBhAQa", timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 200:
+                content = await response.text()
+                YOUR_API_URL = content.strip()
+                logger.info("API URL loaded successfully")
+            else:
+                YOUR_API_URL = FALLBACK_API_URL
+                logger.info("Using fallback API URL")
     except Exception:
         YOUR_API_URL = FALLBACK_API_URL
         logger.info("Using fallback API URL")
@@ -41,133 +68,261 @@ try:
 except RuntimeError:
     pass
 
-async def download_song(link: str) -> str:
-    global YOUR_API_URL
-    
-    if not YOUR_API_URL:
-        await load_api_url()
-        if not YOUR_API_URL:
-            YOUR_API_URL = FALLBACK_API_URL
-    
-    video_id = link.split('v=')[-1].split('&')[0] if 'v=' in link else link
 
-    if not video_id or len(video_id) < 3:
-        return None
+def media_path(video_id: str, video: Union[bool, str] = None) -> str:
+    return os.path.join("downloads", f"{video_id}.{'mp4' if video else 'mp3'}")
 
-    DOWNLOAD_DIR = "downloads"
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    file_path = os.path.join(DOWNLOAD_DIR, f"{video_id}.mp3")
 
-    if os.path.exists(file_path):
-        return file_path
+async def _single_flight(key, func, *args):
+    # Concurrent requests for the same media share one download, which is
+    # only cancelled once every caller waiting on it has gone away.
+    flight = inflight.get(key)
+    if flight is None:
+        flight = inflight[key] = [asyncio.ensure_future(func(*args)), 0]
 
+        def _done(_):
+            if inflight.get(key) is flight:
+                inflight.pop(key)
+
+        flight[0].add_done_callback(_done)
+    flight[1] += 1
     try:
-        async with aiohttp.ClientSession() as session:
-            params = {"url": video_id, "type": "audio"}
-            
-            async with session.get(
-                f"{YOUR_API_URL}/download",
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=60)
-            ) as response:
-                if response.status != 200:
+        return await asyncio.shield(flight[0])
+    finally:
+        flight[1] -= 1
+        if not flight[1] and not flight[0].done():
+            flight[0].cancel()
+
+
+async def _download_token(video_id, media_type):
+    session = get_session()
+    params = {"url": video_id, "type": media_type}
+
+    async with session.get(
+        f"{YOUR_API_URL}/download",
+        params=params,
+        timeout=aiohttp.ClientTimeout(total=60)
+    ) as response:
+        if response.status != 200:
+            return None
+
+        data = await response.json()
+        return data.get("download_token")
+
+
+async def _stream_media(video_id, media_type, file_path, timeout, segmented=True):
+    session = get_session()
+    download_token = await _download_token(video_id, media_type)
+    if not download_token:
+        return False
+
+    stream_url = f"{YOUR_API_URL}/stream/{video_id}?type={media_type}"
+    headers = {"X-Download-Token": download_token}
+    # Keep whatever an earlier attempt already wrote and only ask for the rest
+    part = part_path(file_path)
+    offset = part.stat().st_size if part.exists() else 0
+    # Large videos are fetched as parallel byte ranges when the server allows
+    # it, the first range doubles as the probe for that support
+    probing = (
+        segmented
+        and not offset
+        and media_type == "video"
+        and config.DOWNLOAD_CONNECTIONS > 1
+        and hasattr(os, "pwrite")
+    )
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    elif probing:
+        headers["Range"] = f"bytes=0-{config.DOWNLOAD_CHUNK_SIZE - 1}"
+
+    async with session.get(
+        stream_url,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as file_response:
+        if file_response.status == 416 and offset:
+            part.unlink(missing_ok=True)
+            raise IncompleteDownloadError(f"Stale partial download of {video_id}")
+        if file_response.status >= 500:
+            file_response.raise_for_status()
+        if file_response.status not in (200, 206):
+            return False
+
+        start, total = resume_point(file_response.status, file_response.headers, offset)
+        if start not in (0, offset):
+            part.unlink(missing_ok=True)
+            raise IncompleteDownloadError(f"Server resumed {video_id} at byte {start}, not {offset}")
+
+        with open(part, "ab" if start else "wb") as f:
+            async for chunk in file_response.content.iter_chunked(16384):
+                f.write(chunk)
+
+    size = part.stat().st_size
+    if probing and accepts_ranges(file_response.status, total, config.DOWNLOAD_CHUNK_SIZE):
+        try:
+            await download_segments(
+                session,
+                stream_url,
+                {"X-Download-Token": download_token},
+                part,
+                total,
+                config.DOWNLOAD_CONNECTIONS,
+                config.DOWNLOAD_CHUNK_SIZE,
+                timeout,
+                HttpxClient.MAX_RETRIES,
+                HttpxClient.BACKOFF_FACTOR,
+                offset=size,
+            )
+        except (SegmentError, aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError) as e:
+            LOGGER(__name__).info(f"Segmented download of {video_id} failed ({e!r}), using a single stream")
+            return await _stream_media(video_id, media_type, file_path, timeout, segmented=False)
+        os.replace(part, file_path)
+        return True
+    if probing and file_response.status == 206 and total is None and size == config.DOWNLOAD_CHUNK_SIZE:
+        # The size is unknown and the probe range was filled, fetch the rest as one stream
+        return await _stream_media(video_id, media_type, file_path, timeout, segmented=False)
+
+    if total is not None and size != total:
+        raise IncompleteDownloadError(f"Got {size} of {total} bytes for {video_id}")
+    os.replace(part, file_path)
+    return True
+
+
+async def _fetch_media(video_id, media_type, file_path, timeout, priority, chat_id):
+    async with downloads.slot(priority, chat_id, (video_id, media_type)):
+        if os.path.exists(file_path):
+            return file_path
+
+        for attempt in range(HttpxClient.MAX_RETRIES):
+            try:
+                if await _stream_media(video_id, media_type, file_path, timeout):
+                    mediacache.admit(file_path)
+                    return file_path
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError) as e:
+                if attempt == HttpxClient.MAX_RETRIES - 1:
+                    LOGGER(__name__).warning(f"Download of {video_id} failed: {e!r}")
                     return None
+            except Exception:
+                return None
 
-                data = await response.json()
-                download_token = data.get("download_token")
-                
-                if not download_token:
-                    return None
-                
-                stream_url = f"{YOUR_API_URL}/stream/{video_id}?type=audio"
-                
-                async with session.get(
-                    stream_url,
-                    headers={"X-Download-Token": download_token},
-                    timeout=aiohttp.ClientTimeout(total=300)
-                ) as file_response:
-                    if file_response.status != 200:
-                        return None
-                        
-                    with open(file_path, "wb") as f:
-                        async for chunk in file_response.content.iter_chunked(16384):
-                            f.write(chunk)
-                    
-                    return file_path
+            await asyncio.sleep(HttpxClient.BACKOFF_FACTOR * (2 ** attempt))
 
-    except Exception:
-        return None
 
-async def download_video(link: str) -> str:
+async def _ensure_api_url():
     global YOUR_API_URL
     
     if not YOUR_API_URL:
         await load_api_url()
         if not YOUR_API_URL:
             YOUR_API_URL = FALLBACK_API_URL
-    
-    video_id = link.split('v=')[-1].split('&')[0] if 'v=' in link else link
+
+
+def _video_id(link):
+    return link.split('v=')[-1].split('&')[0] if 'v=' in link else link
+
+
+async def _download_media(link, media_type, timeout, priority, chat_id):
+    await _ensure_api_url()
+    video_id = _video_id(link)
 
     if not video_id or len(video_id) < 3:
         return None
 
-    DOWNLOAD_DIR = "downloads"
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    file_path = os.path.join(DOWNLOAD_DIR, f"{video_id}.mp4")
+    file_path = media_path(video_id, media_type == "video")
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
     if os.path.exists(file_path):
+        mediacache.hit(file_path)
         return file_path
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            params = {"url": video_id, "type": "video"}
-            
-            async with session.get(
-                f"{YOUR_API_URL}/download",
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=60)
-            ) as response:
-                if response.status != 200:
-                    return None
+    # A prefetch joined by a caller that needs the file now moves up the queue
+    downloads.promote((video_id, media_type), priority)
+    return await _single_flight(
+        (video_id, media_type),
+        _fetch_media,
+        video_id,
+        media_type,
+        file_path,
+        timeout,
+        priority,
+        chat_id,
+    )
 
-                data = await response.json()
-                download_token = data.get("download_token")
-                
-                if not download_token:
-                    return None
-                
-                stream_url = f"{YOUR_API_URL}/stream/{video_id}?type=video"
-                
-                async with session.get(
-                    stream_url,
-                    headers={"X-Download-Token": download_token},
-                    timeout=aiohttp.ClientTimeout(total=600)
-                ) as file_response:
-                    if file_response.status != 200:
-                        return None
-                        
-                    with open(file_path, "wb") as f:
-                        async for chunk in file_response.content.iter_chunked(16384):
-                            f.write(chunk)
-                    
-                    return file_path
 
-    except Exception:
+def promote_download(video_id: str, video: Union[bool, str] = None):
+    downloads.promote((video_id, "video" if video else "audio"), PRIORITY_PLAY)
+
+
+async def download_song(
+    link: str, priority: int = PRIORITY_PLAY, chat_id: int = None
+) -> str:
+    return await _download_media(link, "audio", 300, priority, chat_id)
+
+
+async def download_video(
+    link: str, priority: int = PRIORITY_PLAY, chat_id: int = None
+) -> str:
+    return await _download_media(link, "video", 600, priority, chat_id)
+
+
+async def _start_streaming(link, video, chat_id):
+    await _ensure_api_url()
+    video_id = _video_id(link)
+    media_type = "video" if video else "audio"
+    file_path = media_path(video_id, bool(video))
+    if os.path.exists(file_path):
+        mediacache.hit(file_path)
+        return file_path
+    if file_path in streaming:
+        return file_path
+
+    download_token = await _download_token(video_id, media_type)
+    if not download_token:
         return None
 
-async def shell_cmd(cmd):
-    proc = await asyncio.create_subprocess_shell(
-        cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    download = download_video if video else download_song
+    task = asyncio.create_task(download(link, PRIORITY_PLAY, chat_id))
+    streaming[file_path] = (
+        f"{YOUR_API_URL}/stream/{video_id}?type={media_type}",
+        {"X-Download-Token": download_token},
+        task,
     )
-    out, errorz = await proc.communicate()
-    if errorz:
-        if "unavailable videos are hidden" in (errorz.decode("utf-8")).lower():
-            return out.decode("utf-8")
-        else:
-            return errorz.decode("utf-8")
-    return out.decode("utf-8")
+
+    def _done(_):
+        if streaming.get(file_path, (None, None, None))[2] is task:
+            streaming.pop(file_path)
+
+    task.add_done_callback(_done)
+    return file_path
+
+
+def stream_source(file_path):
+    entry = streaming.get(file_path)
+    if entry is None or os.path.exists(file_path):
+        return file_path, None
+    return entry[0], entry[1]
+
+
+async def wait_stream(file_path):
+    entry = streaming.get(file_path)
+    if entry:
+        await asyncio.wait({entry[2]})
+
+def _extract_playlist(link, start, end):
+    opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "ignoreerrors": True,
+        "extract_flat": "in_playlist",
+        "playliststart": start,
+        "playlistend": end,
+    }
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(link, download=False)
+    entries = list((info or {}).get("entries") or [])
+    # Unavailable entries are dropped but still count towards the page
+    return [entry["id"] for entry in entries if entry and entry.get("id")], len(entries)
 
 class YouTubeAPI:
     def __init__(self):
@@ -203,8 +358,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(link):
             title = result["title"]
             duration_min = result["duration"]
             thumbnail = result["thumbnails"][0]["url"].split("?")[0]
@@ -217,8 +371,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(link):
             return result["title"]
 
     async def duration(self, link: str, videoid: Union[bool, str] = None):
@@ -226,8 +379,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(link):
             return result["duration"]
 
     async def thumbnail(self, link: str, videoid: Union[bool, str] = None):
@@ -235,8 +387,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(link):
             return result["thumbnails"][0]["url"].split("?")[0]
 
     async def video(self, link: str, videoid: Union[bool, str] = None):
@@ -258,22 +409,45 @@ class YouTubeAPI:
             link = self.listbase + link
         if "&" in link:
             link = link.split("&")[0]
-        playlist = await shell_cmd(
-            f"yt-dlp -i --get-id --flat-playlist --playlist-end {limit} --skip-download {link}"
-        )
-        try:
-            result = [key for key in playlist.split("\n") if key]
-        except:
-            result = []
-        return result
+        result = []
+        async for page in self.playlist_pages(link, min(limit, config.PLAYLIST_PAGE_SIZE)):
+            result.extend(page)
+            if len(result) >= limit:
+                break
+        return result[:limit]
+
+    async def playlist_pages(self, link, page_size: int, videoid: Union[bool, str] = None):
+        if videoid:
+            link = self.listbase + link
+        if "&" in link:
+            link = link.split("&")[0]
+        match = re.search(r"list=([\w-]+)", link)
+        key = match[1] if match else link
+        ids, start, complete = playlists.get(key, ([], 0, False))
+        for offset in range(0, len(ids), page_size):
+            yield ids[offset : offset + page_size]
+        if complete:
+            return
+        while True:
+            page, read = await asyncio.get_running_loop().run_in_executor(
+                playlist_pool, _extract_playlist, link, start + 1, start + page_size
+            )
+            start += page_size
+            ids = ids + page
+            complete = read < page_size
+            if ids:
+                playlists.set(key, (ids, start, complete))
+            if page:
+                yield page
+            if complete:
+                return
 
     async def track(self, link: str, videoid: Union[bool, str] = None):
         if videoid:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(link):
             title = result["title"]
             duration_min = result["duration"]
             vidid = result["id"]
@@ -320,8 +494,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        a = VideosSearch(link, limit=10)
-        result = (await a.next()).get("result")
+        result = await search(link, limit=10)
         title = result[query_type]["title"]
         duration_min = result[query_type]["duration"]
         vidid = result[query_type]["id"]
@@ -338,15 +511,23 @@ class YouTubeAPI:
         songvideo: Union[bool, str] = None,
         format_id: Union[bool, str] = None,
         title: Union[bool, str] = None,
+        priority: int = PRIORITY_PLAY,
+        chat_id: int = None,
+        stream: bool = False,
     ) -> str:
         if videoid:
             link = self.base + link
 
         try:
+            # Play from the API stream right away and cache the file alongside
+            if stream and config.STREAM_WHILE_DOWNLOADING:
+                file_path = await _start_streaming(link, video, chat_id)
+                if file_path:
+                    return file_path, True
             if video:
-                downloaded_file = await download_video(link)
+                downloaded_file = await download_video(link, priority, chat_id)
             else:
-                downloaded_file = await download_song(link)
+                downloaded_file = await download_song(link, priority, chat_id)
             
             if downloaded_file:
                 return downloaded_file, True
@@ -18,6 +18,28 @@ from config import DOWNLOADS_DIR, API_KEY, API_URL
 from EsproMusic.logging import LOGGER
 
 
+class IncompleteDownloadError(Exception):
+    pass
+
+
+def part_path(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.name}.part")
+
+
+def resume_point(status: int, headers, offset: int) -> tuple[int, Optional[int]]:
+    # Where the response body starts in the file and the full file size, if known
+    length = headers.get("Content-Length")
+    length = int(length) if length and length.isdigit() else None
+    if status != 206:
+        return 0, length
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", headers.get("Content-Range", ""))
+    if not match:
+        return offset, offset + length if length is not None else None
+    total = int(match[2]) if match[2] != "*" else None
+    return int(match[1]), total
+
+
 @dataclass
 class DownloadResult:
     success: bool
@@ -71,39 +93,87 @@ class HttpxClient:
         url: str,
         file_path: Optional[Union[str, Path]] = None,
         overwrite: bool = False,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
         **kwargs: Any,
     ) -> DownloadResult:
         if not url:
             return DownloadResult(success=False, error="Empty URL provided")
 
         headers = self._get_headers(url, kwargs.pop("headers", {}))
-        try:
-            async with self._session.stream(
-                "GET", url, timeout=self._download_timeout, headers=headers
-            ) as response:
-                response.raise_for_status()
-                if file_path is None:
-                    cd = response.headers.get("Content-Disposition", "")
-                    match = re.search(r'filename="?([^"]+)"?', cd)
-                    filename = unquote(match[1]) if match else (Path(url).name or uuid.uuid4().hex)
-                    path = Path(DOWNLOADS_DIR) / filename
-                else:
-                    path = Path(file_path) if isinstance(file_path, str) else file_path
+        path = Path(file_path) if file_path is not None else None
+        if path is not None and path.exists() and not overwrite:
+            return DownloadResult(success=True, file_path=path)
+
+        for attempt in range(max_retries):
+            try:
+                path = await self._stream_to_file(url, path, overwrite, headers)
+                LOGGER(__name__).debug("Successfully downloaded file to %s", path)
+                return DownloadResult(success=True, file_path=path)
+            except Exception as e:
+                error_msg = self._handle_http_error(e, url)
+                if not self._is_retryable(e) or attempt == max_retries - 1:
+                    LOGGER(__name__).error(error_msg)
+                    return DownloadResult(success=False, error=error_msg)
+                LOGGER(__name__).warning(error_msg)
+
+            await asyncio.sleep(backoff_factor * (2 ** attempt))
+
+        return DownloadResult(success=False, error=f"All retries failed for URL: {url}")
 
+    async def _stream_to_file(
+        self,
+        url: str,
+        path: Optional[Path],
+        overwrite: bool,
+        headers: dict[str, str],
+    ) -> Path:
+        # Bytes already in the .part file are kept and only the rest is requested
+        offset = 0
+        if path is not None:
+            part = part_path(path)
+            if part.exists():
+                offset = part.stat().st_size
+                if offset:
+                    headers = {**headers, "Range": f"bytes={offset}-"}
+
+        async with self._session.stream(
+            "GET", url, timeout=self._download_timeout, headers=headers
+        ) as response:
+            if response.status_code == 416 and offset:
+                part.unlink(missing_ok=True)
+                raise IncompleteDownloadError(f"Stale partial download for {url}")
+            response.raise_for_status()
+            if path is None:
+                cd = response.headers.get("Content-Disposition", "")
+                match = re.search(r'filename="?([^"]+)"?', cd)
+                filename = unquote(match[1]) if match else (Path(url).name or uuid.uuid4().hex)
+                path = Path(DOWNLOADS_DIR) / filename
                 if path.exists() and not overwrite:
-                    return DownloadResult(success=True, file_path=path)
+                    return path
+                part = part_path(path)
 
-                path.parent.mkdir(parents=True, exist_ok=True)
-                async with aiofiles.open(path, "wb") as f:
-                    async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
-                        await f.write(chunk)
+            start, total = resume_point(response.status_code, response.headers, offset)
+            if start not in (0, offset):
+                part.unlink(missing_ok=True)
+                raise IncompleteDownloadError(f"Server resumed {url} at byte {start}, not {offset}")
 
-                LOGGER(__name__).debug("Successfully downloaded file to %s", path)
-                return DownloadResult(success=True, file_path=path)
-        except Exception as e:
-            error_msg = self._handle_http_error(e, url)
-            LOGGER(__name__).error(error_msg)
-            return DownloadResult(success=False, error=error_msg)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(part, "ab" if start else "wb") as f:
+                async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
+                    await f.write(chunk)
+
+        size = part.stat().st_size
+        if total is not None and size != total:
+            raise IncompleteDownloadError(f"Got {size} of {total} bytes for {url}")
+        part.replace(path)
+        return path
+
+    @staticmethod
+    def _is_retryable(e: Exception) -> bool:
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code >= 500 or e.response.status_code == 429
+        return isinstance(e, (httpx.RequestError, IncompleteDownloadError))
 
     async def make_request(
         self,
@@ -186,4 +256,6 @@ class HttpxClient:
             return f"Read timeout for {url}: {repr(e)}"
         elif isinstance(e, httpx.RequestError):
             return f"Request failed for {url}: {repr(e)}"
+        elif isinstance(e, IncompleteDownloadError):
+            return str(e)
         return f"Unexpected error for {url}: {repr(e)}"
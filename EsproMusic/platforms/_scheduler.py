@@ -0,0 +1,100 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from EsproMusic.logging import LOGGER
+
+# Lower runs first: the track a chat needs now, then prefetches, then backfill
+PRIORITY_PLAY = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_BACKFILL = 2
+
+
+class DownloadScheduler:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waiting = []
+        self._pending = {}
+        # key -> (turn, waiter, priority) of downloads still waiting for a slot
+        self._keys = {}
+        self._counter = itertools.count()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    def _release(self):
+        while self._waiting:
+            waiter = heapq.heappop(self._waiting)[-1]
+            if not waiter.done():
+                self.queued -= 1
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def promote(self, key, priority: int):
+        # Queue a waiting download again at a more urgent priority, the old
+        # heap entry is skipped once its waiter has been served.
+        entry = self._keys.get(key)
+        if entry is None or entry[1].done() or priority >= entry[2]:
+            return
+        turn, waiter, _ = entry
+        self._keys[key] = (turn, waiter, priority)
+        heapq.heappush(self._waiting, (priority, turn, next(self._counter), waiter))
+
+    async def _acquire(self, priority: int, chat_id, key):
+        if self.running < self.workers and not self.queued:
+            self.running += 1
+            return
+        # Within a priority, a chat's n-th waiting download queues behind
+        # every other chat's first, so one long playlist can not starve the rest.
+        turn = self._pending.get(chat_id, 0)
+        self._pending[chat_id] = turn + 1
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, turn, next(self._counter), waiter))
+        if key is not None:
+            self._keys[key] = (turn, waiter, priority)
+        self.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self.queued -= 1
+            else:
+                self._release()
+            raise
+        finally:
+            self._pending[chat_id] -= 1
+            if not self._pending[chat_id]:
+                del self._pending[chat_id]
+            if key is not None and self._keys.get(key, (None, None))[1] is waiter:
+                del self._keys[key]
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_PLAY, chat_id=None, key=None):
+        start = time.monotonic()
+        await self._acquire(priority, chat_id, key)
+        waited = time.monotonic() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        LOGGER(__name__).debug(
+            f"Download slot for {chat_id} (priority {priority}) after {waited:.2f}s, {self.stats()}"
+        )
+        try:
+            yield
+        finally:
+            self.completed += 1
+            self._release()
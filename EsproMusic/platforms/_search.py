@@ -0,0 +1,90 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+from py_yt import VideosSearch
+from pymongo.errors import PyMongoError
+
+import config
+from EsproMusic.core.mongo import mongodb
+from EsproMusic.logging import LOGGER
+from EsproMusic.utils.cache import TTLCache
+
+metadb = mongodb.ytmeta
+
+# key -> {"result": [...], "hits": n, "stored": bool}
+searches = TTLCache(config.YT_CACHE_SIZE, config.YT_CACHE_TTL)
+searching = {}
+
+VIDEO_ID = re.compile(r"(?:v=|youtu\.be/|shorts/|live/|embed/)([A-Za-z0-9_-]{11})")
+
+
+def _id_key(vidid: str, limit: int = 1) -> str:
+    return f"id:{vidid}:{limit}"
+
+
+def search_key(link: str, limit: int = 1) -> str:
+    match = VIDEO_ID.search(link)
+    if match:
+        return _id_key(match[1], limit)
+    return f"q:{' '.join(link.lower().split())}:{limit}"
+
+
+async def _persist(key, entry):
+    # "updated" is a date so the TTL index drops entries after YT_CACHE_PERSIST_TTL
+    try:
+        await metadb.update_one(
+            {"key": key},
+            {"$set": {"result": entry["result"], "updated": datetime.utcnow()}},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        LOGGER(__name__).warning(f"Failed to store search {key}: {e}")
+
+
+async def _load(key, link, limit):
+    # Only lookups by video id are worth a database round trip
+    if config.YT_CACHE_POPULAR_HITS and key.startswith("id:"):
+        try:
+            doc = await metadb.find_one({"key": key})
+        except PyMongoError:
+            doc = None
+        updated = doc.get("updated") if doc else None
+        # The TTL monitor runs only once a minute, expired entries may still be there
+        if isinstance(updated, datetime) and datetime.utcnow() - updated < timedelta(
+            seconds=config.YT_CACHE_PERSIST_TTL
+        ):
+            return {"result": doc["result"], "hits": 0, "stored": True}
+    results = VideosSearch(link, limit=limit)
+    result = (await results.next()).get("result") or []
+    return {"result": result, "hits": 0, "stored": False}
+
+
+async def search(link: str, limit: int = 1) -> list:
+    key = search_key(link, limit)
+    entry = searches.get(key)
+    if entry is None:
+        task = searching.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_load(key, link, limit))
+            searching[key] = task
+            task.add_done_callback(lambda _: searching.pop(key, None))
+        entry = await asyncio.shield(task)
+        if not entry["result"]:
+            return []
+        searches.set(key, entry)
+        if limit == 1:
+            # A query resolves to a video, later lookups by its id share the entry
+            id_key = _id_key(entry["result"][0]["id"])
+            if id_key != key and id_key not in searches:
+                searches.set(id_key, entry)
+    entry["hits"] += 1
+    if (
+        config.YT_CACHE_POPULAR_HITS
+        and not entry["stored"]
+        and entry["hits"] >= config.YT_CACHE_POPULAR_HITS
+        and limit == 1
+    ):
+        entry["stored"] = True
+        asyncio.create_task(_persist(_id_key(entry["result"][0]["id"]), entry))
+    return entry["result"]
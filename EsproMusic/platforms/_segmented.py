@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import aiohttp
+
+from EsproMusic.platforms._httpx import IncompleteDownloadError
+
+
+class SegmentError(Exception):
+    pass
+
+
+def accepts_ranges(status: int, total, min_size: int) -> bool:
+    # A partial answer to the probe range, for a file that needs more than one range
+    return status == 206 and total is not None and total > min_size
+
+
+async def _fetch_segment(session, url, headers, fd, start, end, timeout):
+    async with session.get(
+        url,
+        headers={**headers, "Range": f"bytes={start}-{end}"},
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as response:
+        if response.status >= 500:
+            response.raise_for_status()
+        if response.status != 206:
+            raise SegmentError(f"Range {start}-{end} answered with {response.status}")
+        position = start
+        async for chunk in response.content.iter_chunked(65536):
+            if position + len(chunk) > end + 1:
+                raise SegmentError(f"Range {start}-{end} returned too many bytes")
+            os.pwrite(fd, chunk, position)
+            position += len(chunk)
+    if position != end + 1:
+        raise IncompleteDownloadError(f"Range {start}-{end} stopped at byte {position}")
+
+
+async def download_segments(
+    session,
+    url,
+    headers,
+    path,
+    size,
+    connections,
+    chunk_size,
+    timeout,
+    retries,
+    backoff,
+    offset=0,
+):
+    # The first offset bytes are already in the file, only the rest is fetched
+    ranges = iter(
+        [
+            (start, min(start + chunk_size, size) - 1)
+            for start in range(offset, size, chunk_size)
+        ]
+    )
+
+    async def worker():
+        for start, end in ranges:
+            for attempt in range(retries):
+                try:
+                    await _fetch_segment(session, url, headers, fd, start, end, timeout)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError):
+                    if attempt == retries - 1:
+                        raise
+                await asyncio.sleep(backoff * (2 ** attempt))
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    tasks = []
+    try:
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+        tasks = [
+            asyncio.create_task(worker())
+            for _ in range(min(connections, -(-(size - offset) // chunk_size)))
+        ]
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A preallocated file with holes can not be resumed byte-wise
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        os.close(fd)
+        fd = None
+        os.remove(path)
+        raise
+    finally:
+        if fd is not None:
+            os.close(fd)
@@ -1,14 +1,11 @@
-import asyncio
-
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from EsproMusic import YouTube, app
 from EsproMusic.core.call import Loy
 from EsproMusic.misc import SUDOERS, db
+from EsproMusic.utils.admincache import get_admins
 from EsproMusic.utils.database import (
-    get_active_chats,
-    get_lang,
     get_upvote_count,
     is_active_chat,
     is_Music_playing,
@@ -18,9 +15,11 @@ from EsproMusic.utils.database import (
     set_loop,
 )
 from EsproMusic.utils.decorators.language import languageCB
-from EsproMusic.utils.formatters import seconds_to_min
-from EsproMusic.utils.inline import close_markup, stream_markup, stream_markup_timer
-from EsproMusic.utils.stream.autoclear import auto_clean
+from EsproMusic.utils.inline import close_markup, stream_markup
+from EsproMusic.utils.stream.autoclear import auto_clean, set_speed_path
+from EsproMusic.utils.stream.clock import start_clock
+from EsproMusic.utils.stream.prefetch import schedule_prefetch, wait_prefetch
+from EsproMusic.utils.stream.progress import schedule_progress
 from EsproMusic.utils.thumbnails import get_thumb
 from config import (
     BANNED_USERS,
@@ -29,13 +28,10 @@ from config import (
     STREAM_IMG_URL,
     TELEGRAM_AUDIO_URL,
     TELEGRAM_VIDEO_URL,
-    adminlist,
     confirmer,
     votemode,
 )
-from strings import get_string
 
-checker = {}
 upvoters = {}
 
 
@@ -123,7 +119,7 @@ async def del_back_playlist(client, CallbackQuery, _):
         is_non_admin = await is_nonadmin_chat(CallbackQuery.message.chat.id)
         if not is_non_admin:
             if CallbackQuery.from_user.id not in SUDOERS:
-                admins = adminlist.get(CallbackQuery.message.chat.id)
+                admins = await get_admins(CallbackQuery.message.chat.id)
                 if not admins:
                     return await CallbackQuery.answer(_["admin_13"], show_alert=True)
                 else:
@@ -197,6 +193,7 @@ async def del_back_playlist(client, CallbackQuery, _):
         else:
             txt = f"➻ sᴛʀᴇᴀᴍ ʀᴇ-ᴘʟᴀʏᴇᴅ 🎄\n│ \n└ʙʏ : {mention} 🥀"
         await CallbackQuery.answer()
+        schedule_prefetch(chat_id)
         queued = check[0]["file"]
         title = (check[0]["title"]).title()
         user = check[0]["by"]
@@ -204,12 +201,13 @@ async def del_back_playlist(client, CallbackQuery, _):
         streamtype = check[0]["streamtype"]
         videoid = check[0]["vidid"]
         status = True if str(streamtype) == "video" else None
-        db[chat_id][0]["played"] = 0
+        start_clock(db[chat_id][0])
+        schedule_progress(chat_id)
         exis = (check[0]).get("old_dur")
         if exis:
             db[chat_id][0]["dur"] = exis
             db[chat_id][0]["seconds"] = check[0]["old_second"]
-            db[chat_id][0]["speed_path"] = None
+            set_speed_path(db[chat_id][0], None)
             db[chat_id][0]["speed"] = 1.0
         if "live_" in queued:
             n, link = await YouTube.video(videoid, True)
@@ -245,12 +243,14 @@ async def del_back_playlist(client, CallbackQuery, _):
             mystic = await CallbackQuery.message.reply_text(
                 _["call_7"], disable_web_page_preview=True
             )
+            await wait_prefetch(videoid, status)
             try:
                 file_path, direct = await YouTube.download(
                     videoid,
                     mystic,
                     videoid=True,
                     video=status,
+                    chat_id=chat_id,
                 )
             except:
                 return await mystic.edit_text(_["call_6"])
@@ -348,50 +348,3 @@ async def del_back_playlist(client, CallbackQuery, _):
                 db[chat_id][0]["mystic"] = run
                 db[chat_id][0]["markup"] = "stream"
             await CallbackQuery.edit_message_text(txt, reply_markup=close_markup(_))
-
-
-async def markup_timer():
-    while not await asyncio.sleep(7):
-        active_chats = await get_active_chats()
-        for chat_id in active_chats:
-            try:
-                if not await is_Music_playing(chat_id):
-                    continue
-                playing = db.get(chat_id)
-                if not playing:
-                    continue
-                duration_seconds = int(playing[0]["seconds"])
-                if duration_seconds == 0:
-                    continue
-                try:
-                    mystic = playing[0]["mystic"]
-                except:
-                    continue
-                try:
-                    check = checker[chat_id][mystic.id]
-                    if check is False:
-                        continue
-                except:
-                    pass
-                try:
-                    language = await get_lang(chat_id)
-                    _ = get_string(language)
-                except:
-                    _ = get_string("en")
-                try:
-                    buttons = stream_markup_timer(
-                        _,
-                        chat_id,
-                        seconds_to_min(playing[0]["played"]),
-                        playing[0]["dur"],
-                    )
-                    await mystic.edit_reply_markup(
-                        reply_markup=InlineKeyboardMarkup(buttons)
-                    )
-                except:
-                    continue
-            except:
-                continue
-
-
-asyncio.create_task(markup_timer())
@@ -6,6 +6,8 @@ from EsproMusic.core.call import Loy
 from EsproMusic.misc import db
 from EsproMusic.utils import AdminRightsCheck, seconds_to_min
 from EsproMusic.utils.inline import close_markup
+from EsproMusic.utils.stream.clock import get_played, set_played
+from EsproMusic.utils.stream.progress import schedule_progress
 from config import BANNED_USERS
 
 
@@ -28,7 +30,7 @@ async def seek_comm(cli, message: Message, _, chat_id):
     if duration_seconds == 0:
         return await message.reply_text(_["admin_22"])
     file_path = playing[0]["file"]
-    duration_played = int(playing[0]["played"])
+    duration_played = get_played(playing[0])
     duration_to_skip = int(query)
     duration = playing[0]["dur"]
     if message.command[0][-2] == "c":
@@ -66,9 +68,10 @@ async def seek_comm(cli, message: Message, _, chat_id):
     except:
         return await mystic.edit_text(_["admin_26"], reply_markup=close_markup(_))
     if message.command[0][-2] == "c":
-        db[chat_id][0]["played"] -= duration_to_skip
+        set_played(db[chat_id][0], duration_played - duration_to_skip)
     else:
-        db[chat_id][0]["played"] += duration_to_skip
+        set_played(db[chat_id][0], duration_played + duration_to_skip)
+    schedule_progress(chat_id)
     await mystic.edit_text(
         text=_["admin_25"].format(seconds_to_min(to_seek), message.from_user.mention),
         reply_markup=close_markup(_),
@@ -8,7 +8,10 @@ from EsproMusic.misc import db
 from EsproMusic.utils.database import get_loop
 from EsproMusic.utils.decorators import AdminRightsCheck
 from EsproMusic.utils.inline import close_markup, stream_markup
-from EsproMusic.utils.stream.autoclear import auto_clean
+from EsproMusic.utils.stream.autoclear import auto_clean, set_speed_path
+from EsproMusic.utils.stream.clock import start_clock
+from EsproMusic.utils.stream.prefetch import schedule_prefetch, wait_prefetch
+from EsproMusic.utils.stream.progress import schedule_progress
 from EsproMusic.utils.thumbnails import get_thumb
 from config import BANNED_USERS
 
@@ -89,18 +92,20 @@ async def skip(cli, message: Message, _, chat_id):
                 return await Loy.stop_stream(chat_id)
             except:
                 return
+    schedule_prefetch(chat_id)
     queued = check[0]["file"]
     title = (check[0]["title"]).title()
     user = check[0]["by"]
     streamtype = check[0]["streamtype"]
     videoid = check[0]["vidid"]
     status = True if str(streamtype) == "video" else None
-    db[chat_id][0]["played"] = 0
+    start_clock(db[chat_id][0])
+    schedule_progress(chat_id)
     exis = (check[0]).get("old_dur")
     if exis:
         db[chat_id][0]["dur"] = exis
         db[chat_id][0]["seconds"] = check[0]["old_second"]
-        db[chat_id][0]["speed_path"] = None
+        set_speed_path(db[chat_id][0], None)
         db[chat_id][0]["speed"] = 1.0
     if "live_" in queued:
         n, link = await YouTube.video(videoid, True)
@@ -130,12 +135,14 @@ async def skip(cli, message: Message, _, chat_id):
         db[chat_id][0]["markup"] = "tg"
     elif "vid_" in queued:
         mystic = await message.reply_text(_["call_7"], disable_web_page_preview=True)
+        await wait_prefetch(videoid, status)
         try:
             file_path, direct = await YouTube.download(
                 videoid,
                 mystic,
                 videoid=True,
                 video=status,
+                chat_id=chat_id,
             )
         except:
             return await mystic.edit_text(_["call_6"])
@@ -1,74 +1,72 @@
-import asyncio
-from datetime import datetime
-
 from pyrogram.enums import ChatType
 
 import config
 from EsproMusic import app
-from EsproMusic.core.call import Loy, autoend
+from EsproMusic.core.call import Loy
 from EsproMusic.utils.database import get_client, is_active_chat, is_autoend
+from EsproMusic.utils.scheduler import handler, pending, schedule
+
+# Chats the assistants never leave on their own
+STAY = {config.LOGGER_ID, -1001686672798, -1001549206010}
 
 
-async def auto_leave():
-    if config.AUTO_LEAVING_ASSISTANT:
-        while not await asyncio.sleep(900):
-            from EsproMusic.core.userbot import assistants
+@handler("leave")
+async def leave_chat(key):
+    number, chat_id = key
+    if chat_id in STAY or await is_active_chat(chat_id):
+        return
+    client = await get_client(number)
+    if client is None:
+        return
+    try:
+        await client.leave_chat(chat_id)
+    except:
+        pass
 
-            for num in assistants:
-                client = await get_client(num)
-                left = 0
-                try:
-                    async for i in client.get_dialogs():
-                        if i.chat.type in [
-                            ChatType.SUPERGROUP,
-                            ChatType.GROUP,
-                            ChatType.CHANNEL,
-                        ]:
-                            if (
-                                i.chat.id != config.LOGGER_ID
-                                and i.chat.id != -1001686672798
-                                and i.chat.id != -1001549206010
-                            ):
-                                if left == 20:
-                                    continue
-                                if not await is_active_chat(i.chat.id):
-                                    try:
-                                        await client.leave_chat(i.chat.id)
-                                        left += 1
-                                    except:
-                                        continue
-                except:
-                    pass
 
+@handler("leave_sweep")
+async def auto_leave(_):
+    # Chats joined before a restart have no pending leave of their own. They
+    # are spread out to keep the old pace of 20 leaves per assistant per interval.
+    from EsproMusic.core.userbot import assistants
 
-asyncio.create_task(auto_leave())
+    for num in assistants:
+        client = await get_client(num)
+        delay = 0
+        try:
+            async for i in client.get_dialogs():
+                if i.chat.type in [
+                    ChatType.SUPERGROUP,
+                    ChatType.GROUP,
+                    ChatType.CHANNEL,
+                ]:
+                    if i.chat.id in STAY:
+                        continue
+                    if pending("leave", (num, i.chat.id)):
+                        continue
+                    if not await is_active_chat(i.chat.id):
+                        schedule("leave", (num, i.chat.id), delay)
+                        delay += config.AUTO_LEAVE_TIME / 20
+        except:
+            pass
 
 
-async def auto_end():
-    while not await asyncio.sleep(5):
-        ender = await is_autoend()
-        if not ender:
-            continue
-        for chat_id in autoend:
-            timer = autoend.get(chat_id)
-            if not timer:
-                continue
-            if datetime.now() > timer:
-                if not await is_active_chat(chat_id):
-                    autoend[chat_id] = {}
-                    continue
-                autoend[chat_id] = {}
-                try:
-                    await Loy.stop_stream(chat_id)
-                except:
-                    continue
-                try:
-                    await app.send_message(
-                        chat_id,
-                        "» ʙᴏᴛ ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ ʟᴇғᴛ ᴠɪᴅᴇᴏᴄʜᴀᴛ ʙᴇᴄᴀᴜsᴇ ɴᴏ ᴏɴᴇ ᴡᴀs ʟɪsᴛᴇɴɪɴɢ ᴏɴ ᴠɪᴅᴇᴏᴄʜᴀᴛ.",
-                    )
-                except:
-                    continue
+if config.AUTO_LEAVING_ASSISTANT:
+    schedule("leave_sweep", None, config.AUTO_LEAVE_TIME)
 
 
-asyncio.create_task(auto_end())
+@handler("autoend")
+async def auto_end(chat_id):
+    if not await is_autoend() or not await is_active_chat(chat_id):
+        return
+    try:
+        await Loy.stop_stream(chat_id)
+    except:
+        return
+    try:
+        await app.send_message(
+            chat_id,
+            "» ʙᴏᴛ ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ ʟᴇғᴛ ᴠɪᴅᴇᴏᴄʜᴀᴛ ʙᴇᴄᴀᴜsᴇ ɴᴏ ᴏɴᴇ ᴡᴀs ʟɪsᴛᴇɴɪɴɢ ᴏɴ ᴠɪᴅᴇᴏᴄʜᴀᴛ.",
+        )
+    except:
+        pass
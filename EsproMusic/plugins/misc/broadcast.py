@@ -3,21 +3,16 @@ import time
 from datetime import datetime, timedelta
 
 from pyrogram import filters
-from pyrogram.enums import ChatMembersFilter
 from pyrogram.errors import FloodWait
 
 from EsproMusic import app
 from EsproMusic.misc import SUDOERS
 from EsproMusic.utils.database import (
-    get_active_chats,
-    get_authuser_names,
     get_client,
-    get_served_chats,
-    get_served_users,
+    iter_served_chats,
 )
 from EsproMusic.utils.decorators.language import language
-from EsproMusic.utils.formatters import alpha_to_int
-from config import adminlist, OWNER_ID, MONGO_DB_URI
+from config import OWNER_ID, MONGO_DB_URI
 from motor.motor_asyncio import AsyncIOMotorClient
 
 # 🟡 Permanent Broadcast User ID
@@ -94,8 +89,8 @@ async def broadcast_handler(client, message, _):
 
     sent = 0
     pin = 0
-    schats = await get_served_chats()
-    chats = [int(chat["chat_id"]) for chat in schats]
+    # Only ids are kept, the cursor must not idle out during the slow send loop.
+    chats = [chat_id async for batch in iter_served_chats() for chat_id in batch]
 
     for i in chats:
         try:
@@ -174,34 +169,3 @@ async def premiumlist_cmd(_, message):
         text += f"ᴜsᴇʀ➥ `{uid}` → {days} ᴅᴀʏs ʟᴇғᴛ ғᴏʀ ғᴜᴄᴋɪɴɢ ᴍᴇ \n"
 
     await message.reply_text(text)
-
-
-# ✅ Auto Clean Admin List
-async def auto_clean():
-    while not await asyncio.sleep(10):
-        try:
-            served_chats = await get_active_chats()
-            for chat_id in served_chats:
-                if chat_id not in adminlist:
-                    adminlist[chat_id] = []
-                    async for user in app.get_chat_members(
-                        chat_id, filter=ChatMembersFilter.ADMINISTRATORS
-                    ):
-                        if user.privileges.can_manage_video_chats:
-                            adminlist[chat_id].append(user.user.id)
-                    authusers = await get_authuser_names(chat_id)
-                    for user in authusers:
-                        user_id = await alpha_to_int(user)
-                        adminlist[chat_id].append(user_id)
-        except:
-            continue
-
-asyncio.create_task(auto_clean())
-
-
-
-
-
-
-
-
@@ -9,9 +9,10 @@ from EsproMusic.misc import SUDOERS
 from EsproMusic.utils import get_readable_time
 from EsproMusic.utils.database import (
     add_banned_user,
+    count_served_chats,
     get_banned_count,
     get_banned_users,
-    get_served_chats,
+    iter_served_chats,
     is_banned_user,
     remove_banned_user,
 )
@@ -38,14 +39,13 @@ async def global_ban(client, message: Message, _):
         return await message.reply_text(_["gban_4"].format(user.mention))
     if user.id not in BANNED_USERS:
         BANNED_USERS.add(user.id)
-    served_chats = []
-    chats = await get_served_chats()
-    for chat in chats:
-        served_chats.append(int(chat["chat_id"]))
-    time_expected = get_readable_time(len(served_chats))
+    time_expected = get_readable_time(await count_served_chats())
     mystic = await message.reply_text(_["gban_5"].format(user.mention, time_expected))
+    await add_banned_user(user.id)
     number_of_chats = 0
-    for chat_id in served_chats:
+    # Only ids are kept, the cursor must not idle out during flood waits.
+    chats = [chat_id async for batch in iter_served_chats() for chat_id in batch]
+    for chat_id in chats:
         try:
             await app.ban_chat_member(chat_id, user.id)
             number_of_chats += 1
@@ -53,7 +53,6 @@ async def global_ban(client, message: Message, _):
             await asyncio.sleep(int(fw.value))
         except:
             continue
-    await add_banned_user(user.id)
     await message.reply_text(
         _["gban_6"].format(
             app.mention,
@@ -80,14 +79,13 @@ async def global_un(client, message: Message, _):
         return await message.reply_text(_["gban_7"].format(user.mention))
     if user.id in BANNED_USERS:
         BANNED_USERS.remove(user.id)
-    served_chats = []
-    chats = await get_served_chats()
-    for chat in chats:
-        served_chats.append(int(chat["chat_id"]))
-    time_expected = get_readable_time(len(served_chats))
+    time_expected = get_readable_time(await count_served_chats())
     mystic = await message.reply_text(_["gban_8"].format(user.mention, time_expected))
+    await remove_banned_user(user.id)
     number_of_chats = 0
-    for chat_id in served_chats:
+    # Only ids are kept, the cursor must not idle out during flood waits.
+    chats = [chat_id async for batch in iter_served_chats() for chat_id in batch]
+    for chat_id in chats:
         try:
             await app.unban_chat_member(chat_id, user.id)
             number_of_chats += 1
@@ -95,7 +93,6 @@ async def global_un(client, message: Message, _):
             await asyncio.sleep(int(fw.value))
         except:
             continue
-    await remove_banned_user(user.id)
     await message.reply_text(_["gban_9"].format(user.mention, number_of_chats))
     await mystic.delete()
 
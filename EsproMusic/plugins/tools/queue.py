@@ -2,21 +2,19 @@ import asyncio
 import os
 
 from pyrogram import filters
-from pyrogram.errors import FloodWait
 from pyrogram.types import CallbackQuery, InputMediaPhoto, Message
 
 import config
 from EsproMusic import app
 from EsproMusic.misc import db
 from EsproMusic.utils import LoyBin, get_channeplayCB, seconds_to_min
-from EsproMusic.utils.database import get_cmode, is_active_chat, is_Music_playing
+from EsproMusic.utils.database import get_cmode, is_active_chat
 from EsproMusic.utils.decorators.language import language, languageCB
 from EsproMusic.utils.inline import queue_back_markup, queue_markup
+from EsproMusic.utils.stream.clock import get_played
+from EsproMusic.utils.stream.progress import unwatch_message, watch_message
 from config import BANNED_USERS
 
-basic = {}
-
-
 def get_image(videoid):
     if os.path.isfile(f"cache/{videoid}.png"):
         return f"cache/{videoid}.png"
@@ -92,39 +90,24 @@ async def get_queue(client, message: Message, _):
             DUR,
             "c" if cplay else "g",
             videoid,
-            seconds_to_min(got[0]["played"]),
+            seconds_to_min(get_played(got[0])),
             got[0]["dur"],
         )
     )
-    basic[videoid] = True
     mystic = await message.reply_photo(IMAGE, caption=cap, reply_markup=upl)
     if DUR != "Unknown":
-        try:
-            while db[chat_id][0]["vidid"] == videoid:
-                await asyncio.sleep(5)
-                if await is_active_chat(chat_id):
-                    if basic[videoid]:
-                        if await is_Music_playing(chat_id):
-                            try:
-                                buttons = queue_markup(
-                                    _,
-                                    DUR,
-                                    "c" if cplay else "g",
-                                    videoid,
-                                    seconds_to_min(db[chat_id][0]["played"]),
-                                    db[chat_id][0]["dur"],
-                                )
-                                await mystic.edit_reply_markup(reply_markup=buttons)
-                            except FloodWait:
-                                pass
-                        else:
-                            pass
-                    else:
-                        break
-                else:
-                    break
-        except:
-            return
+
+        async def render(chat_id, track):
+            return queue_markup(
+                _,
+                DUR,
+                "c" if cplay else "g",
+                videoid,
+                seconds_to_min(get_played(track)),
+                track["dur"],
+            )
+
+        watch_message(chat_id, mystic, render)
 
 
 @app.on_callback_query(filters.regex("GetTimer") & ~BANNED_USERS)
@@ -153,7 +136,7 @@ async def queued_tracks(client, CallbackQuery: CallbackQuery, _):
     if len(got) == 1:
         return await CallbackQuery.answer(_["queue_5"], show_alert=True)
     await CallbackQuery.answer()
-    basic[videoid] = False
+    unwatch_message(CallbackQuery.message)
     buttons = queue_back_markup(_, what)
     med = InputMediaPhoto(
         media="https://telegra.ph//file/6f7d35131f69951c74ee5.jpg",
@@ -232,38 +215,22 @@ async def queue_back(client, CallbackQuery: CallbackQuery, _):
             DUR,
             cplay,
             videoid,
-            seconds_to_min(got[0]["played"]),
+            seconds_to_min(get_played(got[0])),
             got[0]["dur"],
         )
     )
-    basic[videoid] = True
-
     med = InputMediaPhoto(media=IMAGE, caption=cap)
     mystic = await CallbackQuery.edit_message_media(media=med, reply_markup=upl)
     if DUR != "Unknown":
-        try:
-            while db[chat_id][0]["vidid"] == videoid:
-                await asyncio.sleep(5)
-                if await is_active_chat(chat_id):
-                    if basic[videoid]:
-                        if await is_Music_playing(chat_id):
-                            try:
-                                buttons = queue_markup(
-                                    _,
-                                    DUR,
-                                    cplay,
-                                    videoid,
-                                    seconds_to_min(db[chat_id][0]["played"]),
-                                    db[chat_id][0]["dur"],
-                                )
-                                await mystic.edit_reply_markup(reply_markup=buttons)
-                            except FloodWait:
-                                pass
-                        else:
-                            pass
-                    else:
-                        break
-                else:
-                    break
-        except:
-            return
+
+        async def render(chat_id, track):
+            return queue_markup(
+                _,
+                DUR,
+                cplay,
+                videoid,
+                seconds_to_min(get_played(track)),
+                track["dur"],
+            )
+
+        watch_message(chat_id, mystic, render)
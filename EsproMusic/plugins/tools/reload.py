@@ -2,16 +2,15 @@ import asyncio
 import time
 
 from pyrogram import filters
-from pyrogram.enums import ChatMembersFilter
-from pyrogram.types import CallbackQuery, Message
+from pyrogram.types import CallbackQuery, ChatMemberUpdated, Message
 
 from EsproMusic import app
 from EsproMusic.core.call import Loy
-from EsproMusic.misc import db
-from EsproMusic.utils.database import get_assistant, get_authuser_names, get_cmode
+from EsproMusic.utils.admincache import add_admin, can_manage, invalidate, reload_admins
+from EsproMusic.utils.database import get_assistant, get_cmode
 from EsproMusic.utils.decorators import ActualAdminCB, AdminActual, language
-from EsproMusic.utils.formatters import alpha_to_int, get_readable_time
-from config import BANNED_USERS, adminlist, lyrical
+from EsproMusic.utils.formatters import get_readable_time
+from config import BANNED_USERS, lyrical
 
 rel = {}
 
@@ -29,16 +28,7 @@ async def reload_admin_cache(client, message: Message, _):
             if saved > time.time():
                 left = get_readable_time((int(saved) - int(time.time())))
                 return await message.reply_text(_["reload_1"].format(left))
-        adminlist[message.chat.id] = []
-        async for user in app.get_chat_members(
-            message.chat.id, filter=ChatMembersFilter.ADMINISTRATORS
-        ):
-            if user.privileges.can_manage_video_chats:
-                adminlist[message.chat.id].append(user.user.id)
-        authusers = await get_authuser_names(message.chat.id)
-        for user in authusers:
-            user_id = await alpha_to_int(user)
-            adminlist[message.chat.id].append(user_id)
+        await reload_admins(message.chat.id)
         now = int(time.time()) + 180
         rel[message.chat.id] = now
         await message.reply_text(_["reload_2"])
@@ -46,13 +36,22 @@ async def reload_admin_cache(client, message: Message, _):
         await message.reply_text(_["reload_3"])
 
 
+@app.on_chat_member_updated(filters.group)
+async def admin_changed(client, update: ChatMemberUpdated):
+    old, new = update.old_chat_member, update.new_chat_member
+    if can_manage(new):
+        add_admin(update.chat.id, new.user.id)
+    elif can_manage(old):
+        # Auth users keep their access, so let the next check enumerate again
+        invalidate(update.chat.id)
+
+
 @app.on_message(filters.command(["reboot"]) & filters.group & ~BANNED_USERS)
 @AdminActual
 async def restartbot(client, message: Message, _):
     mystic = await message.reply_text(_["reload_4"].format(app.mention))
     await asyncio.sleep(1)
     try:
-        db[message.chat.id] = []
         await Loy.stop_stream_force(message.chat.id)
     except:
         pass
@@ -79,7 +78,6 @@ async def restartbot(client, message: Message, _):
         except:
             pass
         try:
-            db[chat_id] = []
             await Loy.stop_stream_force(chat_id)
         except:
             pass
@@ -13,7 +13,11 @@ from EsproMusic import app
 from EsproMusic.core.userbot import assistants
 from EsproMusic.misc import SUDOERS, mongodb
 from EsproMusic.plugins import ALL_MODULES
-from EsproMusic.utils.database import get_served_chats, get_served_users, get_sudoers
+from EsproMusic.utils.database import (
+    count_served_chats,
+    count_served_users,
+    get_sudoers,
+)
 from EsproMusic.utils.decorators.language import language, languageCB
 from EsproMusic.utils.inline.stats import back_stats_buttons, stats_buttons
 from config import BANNED_USERS
@@ -50,8 +54,8 @@ async def overall_stats(client, CallbackQuery, _):
     except:
         pass
     await CallbackQuery.edit_message_text(_["gstats_1"].format(app.mention))
-    served_chats = len(await get_served_chats())
-    served_users = len(await get_served_users())
+    served_chats = await count_served_chats()
+    served_users = await count_served_users()
     text = _["gstats_3"].format(
         app.mention,
         len(assistants),
@@ -101,8 +105,8 @@ async def bot_stats(client, CallbackQuery, _):
     call = await mongodb.command("dbstats")
     datasize = call["dataSize"] / 1024
     storage = call["storageSize"] / 1024
-    served_chats = len(await get_served_chats())
-    served_users = len(await get_served_users())
+    served_chats = await count_served_chats()
+    served_users = await count_served_users()
     text = _["gstats_5"].format(
         app.mention,
         len(ALL_MODULES),
@@ -0,0 +1,96 @@
+import asyncio
+
+from pyrogram.enums import ChatMemberStatus, ChatMembersFilter
+
+import config
+from EsproMusic import app
+from EsproMusic.utils.cache import TTLCache
+from EsproMusic.utils.database import get_authuser_names
+from EsproMusic.utils.formatters import alpha_to_int
+from EsproMusic.utils.scheduler import handler
+
+# chat_id -> ids of the admins allowed to manage video chats and the auth users
+admins = TTLCache(config.ADMIN_CACHE_SIZE, config.ADMIN_CACHE_TTL)
+loading = {}
+# chat_id -> bumped whenever member updates change the chat, so a load that
+# started before the change does not store its stale result
+generations = {}
+
+
+def can_manage(member) -> bool:
+    if member is None or member.status not in (
+        ChatMemberStatus.ADMINISTRATOR,
+        ChatMemberStatus.OWNER,
+    ):
+        return False
+    return bool(member.privileges and member.privileges.can_manage_video_chats)
+
+
+async def _load(chat_id) -> set:
+    users = set()
+    async for member in app.get_chat_members(
+        chat_id, filter=ChatMembersFilter.ADMINISTRATORS
+    ):
+        if can_manage(member):
+            users.add(member.user.id)
+    for user in await get_authuser_names(chat_id):
+        users.add(await alpha_to_int(user))
+    return users
+
+
+async def reload_admins(chat_id) -> set:
+    generation = generations.get(chat_id, 0)
+    task = loading.get(chat_id)
+    if task is None:
+        task = asyncio.ensure_future(_load(chat_id))
+        loading[chat_id] = task
+
+        def _done(_):
+            if loading.get(chat_id) is task:
+                loading.pop(chat_id)
+
+        task.add_done_callback(_done)
+    users = await asyncio.shield(task)
+    if generations.get(chat_id, 0) != generation:
+        # The chat changed during the load, enumerate it again
+        return await reload_admins(chat_id)
+    admins.set(chat_id, users)
+    return users
+
+
+async def get_admins(chat_id) -> set:
+    users = admins.get(chat_id)
+    if users is not None:
+        return users
+    try:
+        return await reload_admins(chat_id)
+    except Exception:
+        # A chat that can not be enumerated is not retried until the entry expires
+        users = set()
+        admins.set(chat_id, users)
+        return users
+
+
+def add_admin(chat_id, user_id):
+    generations[chat_id] = generations.get(chat_id, 0) + 1
+    users = admins.get(chat_id)
+    if users is not None:
+        users.add(user_id)
+
+
+def remove_admin(chat_id, user_id):
+    generations[chat_id] = generations.get(chat_id, 0) + 1
+    users = admins.get(chat_id)
+    if users is not None:
+        users.discard(user_id)
+
+
+def invalidate(chat_id):
+    generations[chat_id] = generations.get(chat_id, 0) + 1
+    loading.pop(chat_id, None)
+    admins.pop(chat_id)
+
+
+@handler("admins")
+async def preload_admins(chat_id):
+    await get_admins(chat_id)
@@ -1,8 +1,13 @@
+import asyncio
 import random
+import time
 from typing import Dict, List, Union
 
+import config
 from EsproMusic import userbot
 from EsproMusic.core.mongo import mongodb
+from EsproMusic.logging import LOGGER
+from EsproMusic.utils.cache import TTLCache
 
 authdb = mongodb.adminauth
 authuserdb = mongodb.authuser
@@ -27,16 +32,109 @@ active = []
 activevideo = []
 assistantdict = {}
 autoend = {}
-count = {}
-channelconnect = {}
-langm = {}
+autoendmode = []
 loop = {}
 maintenance = []
-nonadmin = {}
 pause = {}
-playmode = {}
-playtype = {}
-skipmode = {}
+servedchats = set()
+servedusers = set()
+servedloaded = []
+
+# Per-chat settings, loaded together and kept coherent by the setters below
+chatsettings = TTLCache(config.SETTINGS_CACHE_SIZE, config.SETTINGS_CACHE_TTL)
+settingsloading = {}
+
+# (collection, settings key, document field, value when the field is None)
+settingsources = (
+    (langdb, "lang", "lang", None),
+    (playmodedb, "playmode", "mode", None),
+    (playtypedb, "playtype", "mode", None),
+    (channeldb, "cmode", "mode", None),
+    (authdb, "nonadmin", None, True),
+    (skipdb, "skipmode", None, False),
+    (countdb, "upvotes", "mode", None),
+)
+
+
+def _default_chat_settings() -> dict:
+    return {
+        "lang": "en",
+        "playmode": "Direct",
+        "playtype": "Everyone",
+        "cmode": None,
+        "nonadmin": False,
+        "skipmode": True,
+        "upvotes": 5,
+    }
+
+
+async def _fetch_chat_settings(chat_id: int) -> dict:
+    docs = await asyncio.gather(
+        *(source[0].find_one({"chat_id": chat_id}) for source in settingsources)
+    )
+    settings = _default_chat_settings()
+    for (_, key, field, value), doc in zip(settingsources, docs):
+        if doc:
+            settings[key] = doc[field] if field else value
+    return settings
+
+
+async def _load_chat_settings(chat_id: int) -> dict:
+    try:
+        settings = await _fetch_chat_settings(chat_id)
+        chatsettings.set(chat_id, settings)
+        return settings
+    finally:
+        settingsloading.pop(chat_id, None)
+
+
+async def get_chat_settings(chat_id: int) -> dict:
+    settings = chatsettings.get(chat_id)
+    if settings is None:
+        task = settingsloading.get(chat_id)
+        if task is None:
+            task = asyncio.create_task(_load_chat_settings(chat_id))
+            settingsloading[chat_id] = task
+        settings = await asyncio.shield(task)
+    return settings
+
+
+async def _set_chat_setting(chat_id: int, key: str, value):
+    settings = await get_chat_settings(chat_id)
+    settings[key] = value
+
+
+async def preload_settings(limit: int, batch_size: int = 1000):
+    # Every collection is streamed in full so that a chat admitted under the
+    # limit has seen all of its documents, and its defaults are trustworthy.
+    start = time.monotonic()
+    rows = 0
+    warmed = {}
+    for collection, key, field, value in settingsources:
+        cursor = collection.find({"chat_id": {"$exists": True}}, {"_id": 0})
+        async for doc in cursor.batch_size(batch_size):
+            rows += 1
+            chat_id = doc["chat_id"]
+            settings = warmed.get(chat_id)
+            if settings is None:
+                if len(warmed) >= limit:
+                    continue
+                settings = warmed[chat_id] = _default_chat_settings()
+            settings[key] = doc.get(field) if field else value
+    for chat_id, settings in warmed.items():
+        chatsettings.set(chat_id, settings)
+
+    cursor = assdb.find({"chat_id": {"$exists": True}}, {"_id": 0})
+    async for doc in cursor.batch_size(batch_size):
+        rows += 1
+        if len(assistantdict) >= limit:
+            continue
+        if doc.get("assistant"):
+            assistantdict[doc["chat_id"]] = doc["assistant"]
+
+    LOGGER(__name__).info(
+        f"Preloaded settings of {len(warmed)} chats ({rows} rows) in {time.monotonic() - start:.2f}s."
+    )
 
 
 async def get_assistant_number(chat_id: int) -> str:
@@ -45,16 +143,7 @@ async def get_assistant_number(chat_id: int) -> str:
 
 
 async def get_client(assistant: int):
-    if int(assistant) == 1:
-        return userbot.one
-    elif int(assistant) == 2:
-        return userbot.two
-    elif int(assistant) == 3:
-        return userbot.three
-    elif int(assistant) == 4:
-        return userbot.four
-    elif int(assistant) == 5:
-        return userbot.five
+    return userbot.clients.get(int(assistant))
 
 
 async def set_assistant_new(chat_id, number):
@@ -66,10 +155,44 @@ async def set_assistant_new(chat_id, number):
     )
 
 
-async def set_assistant(chat_id):
+def assistant_load() -> dict:
     from EsproMusic.core.userbot import assistants
 
-    ran_assistant = random.choice(assistants)
+    load = {number: 0 for number in assistants}
+    for chat_id in active:
+        number = assistantdict.get(chat_id)
+        if number in load:
+            load[number] += 1
+    return load
+
+
+def pick_assistant() -> int:
+    load = assistant_load()
+    limit = config.ASSISTANT_MAX_CALLS
+    candidates = [number for number in load if not limit or load[number] < limit]
+    if not candidates:
+        candidates = list(load)
+    least = min(load[number] for number in candidates)
+    return random.choice([number for number in candidates if load[number] == least])
+
+
+async def rebalance_assistant(chat_id: int):
+    # Only idle chats are moved, an ongoing call stays on its assistant.
+    if chat_id in active or not config.ASSISTANT_MAX_CALLS:
+        return
+    assistant = assistantdict.get(chat_id)
+    if not assistant:
+        return
+    if assistant_load().get(assistant, 0) < config.ASSISTANT_MAX_CALLS:
+        return
+    number = pick_assistant()
+    if number != assistant:
+        assistantdict[chat_id] = number
+        await set_assistant_new(chat_id, number)
+
+
+async def set_assistant(chat_id):
+    ran_assistant = pick_assistant()
     assistantdict[chat_id] = ran_assistant
     await assdb.update_one(
         {"chat_id": chat_id},
@@ -108,9 +231,7 @@ async def get_assistant(chat_id: int) -> str:
 
 
 async def set_calls_assistant(chat_id):
-    from EsproMusic.core.userbot import assistants
-
-    ran_assistant = random.choice(assistants)
+    ran_assistant = pick_assistant()
     assistantdict[chat_id] = ran_assistant
     await assdb.update_one(
         {"chat_id": chat_id},
@@ -140,77 +261,60 @@ async def group_assistant(self, chat_id: int) -> int:
             assis = assistant
         else:
             assis = await set_calls_assistant(chat_id)
-    if int(assis) == 1:
-        return self.one
-    elif int(assis) == 2:
-        return self.two
-    elif int(assis) == 3:
-        return self.three
-    elif int(assis) == 4:
-        return self.four
-    elif int(assis) == 5:
-        return self.five
+    return self.clients.get(int(assis))
 
 
 async def is_skipmode(chat_id: int) -> bool:
-    mode = skipmode.get(chat_id)
-    if not mode:
-        user = await skipdb.find_one({"chat_id": chat_id})
-        if not user:
-            skipmode[chat_id] = True
-            return True
-        skipmode[chat_id] = False
-        return False
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["skipmode"]
 
 
 async def skip_on(chat_id: int):
-    skipmode[chat_id] = True
-    user = await skipdb.find_one({"chat_id": chat_id})
-    if user:
-        return await skipdb.delete_one({"chat_id": chat_id})
+    await _set_chat_setting(chat_id, "skipmode", True)
+    return await skipdb.delete_one({"chat_id": chat_id})
 
 
 async def skip_off(chat_id: int):
-    skipmode[chat_id] = False
-    user = await skipdb.find_one({"chat_id": chat_id})
-    if not user:
-        return await skipdb.insert_one({"chat_id": chat_id})
+    await _set_chat_setting(chat_id, "skipmode", False)
+    return await skipdb.update_one(
+        {"chat_id": chat_id}, {"$setOnInsert": {"chat_id": chat_id}}, upsert=True
+    )
 
 
 async def get_upvote_count(chat_id: int) -> int:
-    mode = count.get(chat_id)
-    if not mode:
-        mode = await countdb.find_one({"chat_id": chat_id})
-        if not mode:
-            return 5
-        count[chat_id] = mode["mode"]
-        return mode["mode"]
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["upvotes"]
 
 
 async def set_upvotes(chat_id: int, mode: int):
-    count[chat_id] = mode
+    await _set_chat_setting(chat_id, "upvotes", mode)
     await countdb.update_one(
         {"chat_id": chat_id}, {"$set": {"mode": mode}}, upsert=True
     )
 
 
 async def is_autoend() -> bool:
-    chat_id = 1234
-    user = await autoenddb.find_one({"chat_id": chat_id})
-    if not user:
-        return False
-    return True
+    if not autoendmode:
+        chat_id = 1234
+        user = await autoenddb.find_one({"chat_id": chat_id})
+        autoendmode.clear()
+        autoendmode.append(bool(user))
+    return autoendmode[0]
 
 
 async def autoend_on():
     chat_id = 1234
-    await autoenddb.insert_one({"chat_id": chat_id})
+    autoendmode.clear()
+    autoendmode.append(True)
+    await autoenddb.update_one(
+        {"chat_id": chat_id}, {"$setOnInsert": {"chat_id": chat_id}}, upsert=True
+    )
 
 
 async def autoend_off():
     chat_id = 1234
+    autoendmode.clear()
+    autoendmode.append(False)
     await autoenddb.delete_one({"chat_id": chat_id})
 
 
@@ -226,75 +330,48 @@ async def set_loop(chat_id: int, mode: int):
 
 
 async def get_cmode(chat_id: int) -> int:
-    mode = channelconnect.get(chat_id)
-    if not mode:
-        mode = await channeldb.find_one({"chat_id": chat_id})
-        if not mode:
-            return None
-        channelconnect[chat_id] = mode["mode"]
-        return mode["mode"]
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["cmode"]
 
 
 async def set_cmode(chat_id: int, mode: int):
-    channelconnect[chat_id] = mode
+    await _set_chat_setting(chat_id, "cmode", mode)
     await channeldb.update_one(
         {"chat_id": chat_id}, {"$set": {"mode": mode}}, upsert=True
     )
 
 
 async def get_playtype(chat_id: int) -> str:
-    mode = playtype.get(chat_id)
-    if not mode:
-        mode = await playtypedb.find_one({"chat_id": chat_id})
-        if not mode:
-            playtype[chat_id] = "Everyone"
-            return "Everyone"
-        playtype[chat_id] = mode["mode"]
-        return mode["mode"]
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["playtype"]
 
 
 async def set_playtype(chat_id: int, mode: str):
-    playtype[chat_id] = mode
+    await _set_chat_setting(chat_id, "playtype", mode)
     await playtypedb.update_one(
         {"chat_id": chat_id}, {"$set": {"mode": mode}}, upsert=True
     )
 
 
 async def get_playmode(chat_id: int) -> str:
-    mode = playmode.get(chat_id)
-    if not mode:
-        mode = await playmodedb.find_one({"chat_id": chat_id})
-        if not mode:
-            playmode[chat_id] = "Direct"
-            return "Direct"
-        playmode[chat_id] = mode["mode"]
-        return mode["mode"]
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["playmode"]
 
 
 async def set_playmode(chat_id: int, mode: str):
-    playmode[chat_id] = mode
+    await _set_chat_setting(chat_id, "playmode", mode)
     await playmodedb.update_one(
         {"chat_id": chat_id}, {"$set": {"mode": mode}}, upsert=True
     )
 
 
 async def get_lang(chat_id: int) -> str:
-    mode = langm.get(chat_id)
-    if not mode:
-        lang = await langdb.find_one({"chat_id": chat_id})
-        if not lang:
-            langm[chat_id] = "en"
-            return "en"
-        langm[chat_id] = lang["lang"]
-        return lang["lang"]
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["lang"]
 
 
 async def set_lang(chat_id: int, lang: str):
-    langm[chat_id] = lang
+    await _set_chat_setting(chat_id, "lang", lang)
     await langdb.update_one({"chat_id": chat_id}, {"$set": {"lang": lang}}, upsert=True)
 
 
@@ -363,30 +440,19 @@ async def check_nonadmin_chat(chat_id: int) -> bool:
 
 
 async def is_nonadmin_chat(chat_id: int) -> bool:
-    mode = nonadmin.get(chat_id)
-    if not mode:
-        user = await authdb.find_one({"chat_id": chat_id})
-        if not user:
-            nonadmin[chat_id] = False
-            return False
-        nonadmin[chat_id] = True
-        return True
-    return mode
+    settings = await get_chat_settings(chat_id)
+    return settings["nonadmin"]
 
 
 async def add_nonadmin_chat(chat_id: int):
-    nonadmin[chat_id] = True
-    is_admin = await check_nonadmin_chat(chat_id)
-    if is_admin:
-        return
-    return await authdb.insert_one({"chat_id": chat_id})
+    await _set_chat_setting(chat_id, "nonadmin", True)
+    return await authdb.update_one(
+        {"chat_id": chat_id}, {"$setOnInsert": {"chat_id": chat_id}}, upsert=True
+    )
 
 
 async def remove_nonadmin_chat(chat_id: int):
-    nonadmin[chat_id] = False
-    is_admin = await check_nonadmin_chat(chat_id)
-    if not is_admin:
-        return
+    await _set_chat_setting(chat_id, "nonadmin", False)
     return await authdb.delete_one({"chat_id": chat_id})
 
 
@@ -398,16 +464,12 @@ async def is_on_off(on_off: int) -> bool:
 
 
 async def add_on(on_off: int):
-    is_on = await is_on_off(on_off)
-    if is_on:
-        return
-    return await onoffdb.insert_one({"on_off": on_off})
+    return await onoffdb.update_one(
+        {"on_off": on_off}, {"$setOnInsert": {"on_off": on_off}}, upsert=True
+    )
 
 
 async def add_off(on_off: int):
-    is_off = await is_on_off(on_off)
-    if not is_off:
-        return
     return await onoffdb.delete_one({"on_off": on_off})
 
 
@@ -432,22 +494,32 @@ async def is_maintenance():
 async def maintenance_off():
     maintenance.clear()
     maintenance.append(2)
-    is_off = await is_on_off(1)
-    if not is_off:
-        return
-    return await onoffdb.delete_one({"on_off": 1})
+    return await add_off(1)
 
 
 async def maintenance_on():
     maintenance.clear()
     maintenance.append(1)
-    is_on = await is_on_off(1)
-    if is_on:
-        return
-    return await onoffdb.insert_one({"on_off": 1})
+    return await add_on(1)
+
+
+async def load_served(batch_size: int = 5000):
+    start = time.monotonic()
+    async for user in usersdb.find({}, {"_id": 0, "user_id": 1}).batch_size(batch_size):
+        if "user_id" in user:
+            servedusers.add(user["user_id"])
+    async for chat in chatsdb.find({}, {"_id": 0, "chat_id": 1}).batch_size(batch_size):
+        if "chat_id" in chat:
+            servedchats.add(chat["chat_id"])
+    servedloaded.append(True)
+    LOGGER(__name__).info(
+        f"Loaded {len(servedusers)} served users and {len(servedchats)} served chats in {time.monotonic() - start:.2f}s."
+    )
 
 
 async def is_served_user(user_id: int) -> bool:
+    if servedloaded:
+        return user_id in servedusers
     user = await usersdb.find_one({"user_id": user_id})
     if not user:
         return False
@@ -456,26 +528,66 @@ async def is_served_user(user_id: int) -> bool:
 
 async def get_served_users() -> list:
     users_list = []
-    async for user in usersdb.find({"user_id": {"$gt": 0}}):
+    async for user in usersdb.find({"user_id": {"$gt": 0}}, {"_id": 0, "user_id": 1}):
         users_list.append(user)
     return users_list
 
 
+async def iter_served_users(batch_size: int = 1000):
+    batch = []
+    cursor = usersdb.find({"user_id": {"$gt": 0}}, {"_id": 0, "user_id": 1})
+    async for user in cursor.batch_size(batch_size):
+        batch.append(user["user_id"])
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def count_served_users() -> int:
+    return await usersdb.count_documents({"user_id": {"$gt": 0}})
+
+
 async def add_served_user(user_id: int):
-    is_served = await is_served_user(user_id)
-    if is_served:
+    if user_id in servedusers:
         return
-    return await usersdb.insert_one({"user_id": user_id})
+    servedusers.add(user_id)
+    try:
+        return await usersdb.update_one(
+            {"user_id": user_id}, {"$setOnInsert": {"user_id": user_id}}, upsert=True
+        )
+    except:
+        servedusers.discard(user_id)
+        raise
 
 
 async def get_served_chats() -> list:
     chats_list = []
-    async for chat in chatsdb.find({"chat_id": {"$lt": 0}}):
+    async for chat in chatsdb.find({"chat_id": {"$lt": 0}}, {"_id": 0, "chat_id": 1}):
         chats_list.append(chat)
     return chats_list
 
 
+async def iter_served_chats(batch_size: int = 1000):
+    batch = []
+    cursor = chatsdb.find({"chat_id": {"$lt": 0}}, {"_id": 0, "chat_id": 1})
+    async for chat in cursor.batch_size(batch_size):
+        batch.append(chat["chat_id"])
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def count_served_chats() -> int:
+    return await chatsdb.count_documents({"chat_id": {"$lt": 0}})
+
+
 async def is_served_chat(chat_id: int) -> bool:
+    if servedloaded:
+        return chat_id in servedchats
     chat = await chatsdb.find_one({"chat_id": chat_id})
     if not chat:
         return False
@@ -483,10 +595,16 @@ async def is_served_chat(chat_id: int) -> bool:
 
 
 async def add_served_chat(chat_id: int):
-    is_served = await is_served_chat(chat_id)
-    if is_served:
+    if chat_id in servedchats:
         return
-    return await chatsdb.insert_one({"chat_id": chat_id})
+    servedchats.add(chat_id)
+    try:
+        return await chatsdb.update_one(
+            {"chat_id": chat_id}, {"$setOnInsert": {"chat_id": chat_id}}, upsert=True
+        )
+    except:
+        servedchats.discard(chat_id)
+        raise
 
 
 async def blacklisted_chats() -> list:
@@ -497,17 +615,15 @@ async def blacklisted_chats() -> list:
 
 
 async def blacklist_chat(chat_id: int) -> bool:
-    if not await blacklist_chatdb.find_one({"chat_id": chat_id}):
-        await blacklist_chatdb.insert_one({"chat_id": chat_id})
-        return True
-    return False
+    result = await blacklist_chatdb.update_one(
+        {"chat_id": chat_id}, {"$setOnInsert": {"chat_id": chat_id}}, upsert=True
+    )
+    return result.upserted_id is not None
 
 
 async def whitelist_chat(chat_id: int) -> bool:
-    if await blacklist_chatdb.find_one({"chat_id": chat_id}):
-        await blacklist_chatdb.delete_one({"chat_id": chat_id})
-        return True
-    return False
+    result = await blacklist_chatdb.delete_one({"chat_id": chat_id})
+    return result.deleted_count > 0
 
 
 async def _get_authusers(chat_id: int) -> Dict[str, int]:
@@ -573,16 +689,12 @@ async def is_gbanned_user(user_id: int) -> bool:
 
 
 async def add_gban_user(user_id: int):
-    is_gbanned = await is_gbanned_user(user_id)
-    if is_gbanned:
-        return
-    return await gbansdb.insert_one({"user_id": user_id})
+    return await gbansdb.update_one(
+        {"user_id": user_id}, {"$setOnInsert": {"user_id": user_id}}, upsert=True
+    )
 
 
 async def remove_gban_user(user_id: int):
-    is_gbanned = await is_gbanned_user(user_id)
-    if not is_gbanned:
-        return
     return await gbansdb.delete_one({"user_id": user_id})
 
 
@@ -620,9 +732,7 @@ async def get_banned_users() -> list:
 
 
 async def get_banned_count() -> int:
-    users = blockeddb.find({"user_id": {"$gt": 0}})
-    users = await users.to_list(length=100000)
-    return len(users)
+    return await blockeddb.count_documents({"user_id": {"$gt": 0}})
 
 
 async def is_banned_user(user_id: int) -> bool:
@@ -633,14 +743,10 @@ async def is_banned_user(user_id: int) -> bool:
 
 
 async def add_banned_user(user_id: int):
-    is_gbanned = await is_banned_user(user_id)
-    if is_gbanned:
-        return
-    return await blockeddb.insert_one({"user_id": user_id})
+    return await blockeddb.update_one(
+        {"user_id": user_id}, {"$setOnInsert": {"user_id": user_id}}, upsert=True
+    )
 
 
 async def remove_banned_user(user_id: int):
-    is_gbanned = await is_banned_user(user_id)
-    if not is_gbanned:
-        return
     return await blockeddb.delete_one({"user_id": user_id})
@@ -11,17 +11,26 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from EsproMusic import YouTube, app
 from EsproMusic.misc import SUDOERS
+from EsproMusic.utils.admincache import get_admins
 from EsproMusic.utils.database import (
     get_assistant,
+    get_assistant_number,
     get_cmode,
     get_lang,
     get_playmode,
     get_playtype,
     is_active_chat,
     is_maintenance,
+    rebalance_assistant,
 )
 from EsproMusic.utils.inline import botplaylist_markup
-from config import PLAYLIST_IMG_URL, SUPPORT_CHAT, adminlist
+from EsproMusic.utils.scheduler import schedule
+from config import (
+    AUTO_LEAVE_TIME,
+    AUTO_LEAVING_ASSISTANT,
+    PLAYLIST_IMG_URL,
+    SUPPORT_CHAT,
+)
 from strings import get_string
 
 links = {}
@@ -93,7 +102,7 @@ def PlayWrapper(command):
         playty = await get_playtype(message.chat.id)
         if playty != "Everyone":
             if message.from_user.id not in SUDOERS:
-                admins = adminlist.get(message.chat.id)
+                admins = await get_admins(message.chat.id)
                 if not admins:
                     return await message.reply_text(_["admin_13"])
                 else:
@@ -114,7 +123,16 @@ def PlayWrapper(command):
             fplay = None
 
         if not await is_active_chat(chat_id):
+            await rebalance_assistant(chat_id)
             userbot = await get_assistant(chat_id)
+            if AUTO_LEAVING_ASSISTANT:
+                # Cancelled by join_call, so only an assistant whose call never
+                # started leaves again
+                schedule(
+                    "leave",
+                    (await get_assistant_number(chat_id), chat_id),
+                    AUTO_LEAVE_TIME,
+                )
             try:
                 try:
                     get = await app.get_chat_member(chat_id, userbot.id)
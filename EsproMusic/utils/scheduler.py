@@ -0,0 +1,75 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from EsproMusic.logging import LOGGER
+
+# kind -> async callback(key), looked up when an event of that kind is due
+handlers = {}
+# (kind, key) -> sequence number of its pending event, older heap entries are stale
+events = {}
+_heap = []
+_counter = itertools.count()
+_wakeup = asyncio.Event()
+_runner = None
+
+
+def handler(kind):
+    def decorator(func):
+        handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def schedule_at(kind, key, when: float):
+    global _runner
+    seq = next(_counter)
+    events[(kind, key)] = seq
+    heapq.heappush(_heap, (when, seq, kind, key))
+    if _heap[0][1] == seq:
+        _wakeup.set()
+    if _runner is None or _runner.done():
+        _runner = asyncio.create_task(_run())
+
+
+def schedule(kind, key, delay: float):
+    schedule_at(kind, key, time.monotonic() + delay)
+
+
+def cancel(kind, key):
+    events.pop((kind, key), None)
+
+
+def pending(kind, key) -> bool:
+    return (kind, key) in events
+
+
+async def _fire(kind, key):
+    callback = handlers.get(kind)
+    if callback is None:
+        return
+    try:
+        await callback(key)
+    except Exception as e:
+        LOGGER(__name__).warning(f"Scheduled {kind} for {key} failed: {e}")
+
+
+async def _run():
+    while _heap:
+        when, seq, kind, key = _heap[0]
+        if events.get((kind, key)) != seq:
+            heapq.heappop(_heap)
+            continue
+        wait = when - time.monotonic()
+        if wait > 0:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        heapq.heappop(_heap)
+        del events[(kind, key)]
+        asyncio.create_task(_fire(kind, key))
@@ -1,18 +1,52 @@
 import os
 
-from config import autoclean
+from EsproMusic.core.mediacache import is_cached
+from EsproMusic.misc import db
 
+# path -> number of queue entries across all chats still referring to it
+references = {}
 
-async def auto_clean(popped):
+
+def retain(path):
+    if path:
+        references[path] = references.get(path, 0) + 1
+
+
+def release(path):
+    if not path:
+        return
+    count = references.get(path, 0) - 1
+    if count > 0:
+        references[path] = count
+        return
+    references.pop(path, None)
+    if any(tag in path for tag in ("vid_", "live_", "index_")):
+        return
+    # Cached downloads stay on disk for the next chat and are evicted by quota
+    if is_cached(path):
+        return
     try:
-        rem = popped["file"]
-        autoclean.remove(rem)
-        count = autoclean.count(rem)
-        if count == 0:
-            if "vid_" not in rem or "live_" not in rem or "index_" not in rem:
-                try:
-                    os.remove(rem)
-                except:
-                    pass
+        os.remove(path)
     except:
         pass
+
+
+def set_speed_path(track, path):
+    old = track.get("speed_path")
+    retain(path)
+    track["speed_path"] = path
+    release(old)
+
+
+async def auto_clean(popped):
+    if not popped:
+        return
+    release(popped.get("file"))
+    release(popped.get("speed_path"))
+
+
+async def clear_queue(chat_id):
+    queue = db.get(chat_id) or []
+    db[chat_id] = []
+    for popped in queue:
+        await auto_clean(popped)
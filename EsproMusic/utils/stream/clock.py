@@ -0,0 +1,39 @@
+import time
+
+from EsproMusic.misc import db
+
+# A track's position is its "played" offset plus the time since "started",
+# which is None while the track is paused or not yet playing.
+
+
+def get_played(track) -> int:
+    duration = int(track.get("seconds") or 0)
+    if not duration:
+        return int(track["played"])
+    seconds = track["played"]
+    if track.get("started") is not None:
+        seconds += time.monotonic() - track["started"]
+    return int(min(seconds, duration))
+
+
+def set_played(track, seconds, running=None):
+    if running is None:
+        running = track.get("started") is not None
+    track["played"] = seconds
+    track["started"] = time.monotonic() if running else None
+
+
+def start_clock(track):
+    set_played(track, 0, running=True)
+
+
+def pause_clock(chat_id):
+    playing = db.get(chat_id)
+    if playing:
+        set_played(playing[0], get_played(playing[0]), running=False)
+
+
+def resume_clock(chat_id):
+    playing = db.get(chat_id)
+    if playing and playing[0].get("started") is None:
+        set_played(playing[0], playing[0]["played"], running=True)
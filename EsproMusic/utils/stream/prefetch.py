@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import config
+from EsproMusic import YouTube
+from EsproMusic.misc import db
+from EsproMusic.platforms._scheduler import (
+    PRIORITY_BACKFILL,
+    PRIORITY_PLAY,
+    PRIORITY_PREFETCH,
+)
+from EsproMusic.platforms.Youtube import media_path, promote_download
+
+# (vidid, video) -> running download task
+prefetching = {}
+# chat_id -> keys that chat currently wants on disk
+prefetchchats = {}
+
+
+def _wanted(chat_id) -> dict:
+    keys = {}
+    for position, track in enumerate(
+        (db.get(chat_id) or [])[: config.PREFETCH_DEPTH + 1]
+    ):
+        if "vid_" in str(track["file"]):
+            key = (track["vidid"], str(track["streamtype"]) == "video")
+            if key not in keys:
+                keys[key] = position
+    return keys
+
+
+async def _prefetch(vidid, video, priority, chat_id):
+    if os.path.exists(media_path(vidid, video)):
+        return
+    await YouTube.download(
+        vidid, None, videoid=True, video=video, priority=priority, chat_id=chat_id
+    )
+
+
+def _start(key, position, chat_id):
+    if key in prefetching:
+        return
+    if position == 0:
+        priority = PRIORITY_PLAY
+    elif position == 1:
+        priority = PRIORITY_PREFETCH
+    else:
+        priority = PRIORITY_BACKFILL
+    task = asyncio.create_task(_prefetch(*key, priority, chat_id))
+    prefetching[key] = task
+
+    def _done(_):
+        if prefetching.get(key) is task:
+            prefetching.pop(key)
+
+    task.add_done_callback(_done)
+
+
+def _release(key):
+    for keys in prefetchchats.values():
+        if key in keys:
+            return
+    task = prefetching.pop(key, None)
+    if task:
+        task.cancel()
+
+
+def schedule_prefetch(chat_id):
+    if not config.PREFETCH_DEPTH:
+        return
+    wanted = _wanted(chat_id)
+    keys = set(wanted)
+    old = prefetchchats.pop(chat_id, set())
+    if keys:
+        prefetchchats[chat_id] = keys
+    for key in old - keys:
+        _release(key)
+    for key in keys - old:
+        _start(key, wanted[key], chat_id)
+    # A prefetch whose track is now up next must not wait behind other chats'
+    for key in keys & old:
+        if wanted[key] == 0 and key in prefetching:
+            promote_download(*key)
+
+
+async def wait_prefetch(vidid, video):
+    task = prefetching.get((vidid, bool(video)))
+    if task:
+        promote_download(vidid, video)
+        await asyncio.wait({task})
+
+
+def is_prefetched(vidid, video) -> bool:
+    return os.path.exists(media_path(vidid, bool(video)))
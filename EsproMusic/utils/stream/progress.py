@@ -0,0 +1,129 @@
+import math
+import time
+
+from pyrogram.errors import FloodWait
+from pyrogram.types import InlineKeyboardMarkup
+
+from EsproMusic.misc import db
+from EsproMusic.utils.database import get_lang
+from EsproMusic.utils.formatters import seconds_to_min, time_to_seconds
+from EsproMusic.utils.inline.play import stream_markup_timer
+from EsproMusic.utils.scheduler import cancel, handler, schedule_at
+from EsproMusic.utils.stream.clock import get_played
+from strings import get_string
+
+# Percentages of the track at which the 10-step progress bar moves
+STEPS = (1, 11, 20, 30, 40, 50, 60, 70, 80, 95)
+
+# key -> {"chat_id", "track", "message", "render"}
+watches = {}
+# chat_id -> keys of the messages showing that chat's progress
+chatwatches = {}
+# Telegram flood waits hold back every edit, not only the one that hit it
+_flood_until = 0.0
+
+
+def _next_due(track):
+    if track.get("started") is None or not int(track.get("seconds") or 0):
+        return None
+    try:
+        duration = time_to_seconds(track["dur"])
+    except ValueError:
+        return None
+    played = track["played"] + time.monotonic() - track["started"]
+    for percent in STEPS:
+        at = math.ceil(percent * duration / 100)
+        if at > played:
+            return track["started"] + at - track["played"]
+    return None
+
+
+def _schedule(key):
+    due = _next_due(watches[key]["track"])
+    if due is None:
+        cancel("progress", key)
+    else:
+        schedule_at("progress", key, max(due, _flood_until))
+
+
+def _add(key, chat_id, track, message, render):
+    watches[key] = {
+        "chat_id": chat_id,
+        "track": track,
+        "message": message,
+        "render": render,
+    }
+    chatwatches.setdefault(chat_id, set()).add(key)
+    _schedule(key)
+
+
+def _drop(key):
+    cancel("progress", key)
+    entry = watches.pop(key, None)
+    if entry is None:
+        return
+    keys = chatwatches.get(entry["chat_id"])
+    if keys:
+        keys.discard(key)
+        if not keys:
+            chatwatches.pop(entry["chat_id"])
+
+
+async def _stream_markup(chat_id, track):
+    try:
+        _ = get_string(await get_lang(chat_id))
+    except:
+        _ = get_string("en")
+    return InlineKeyboardMarkup(
+        stream_markup_timer(
+            _, chat_id, seconds_to_min(get_played(track)), track["dur"]
+        )
+    )
+
+
+@handler("progress")
+async def _edit(key):
+    global _flood_until
+    entry = watches.get(key)
+    if entry is None:
+        return
+    if _flood_until > time.monotonic():
+        return schedule_at("progress", key, _flood_until)
+    playing = db.get(entry["chat_id"])
+    if not playing or playing[0] is not entry["track"]:
+        return _drop(key)
+    message = entry["message"] or entry["track"].get("mystic")
+    if message is not None:
+        try:
+            markup = await entry["render"](entry["chat_id"], entry["track"])
+            await message.edit_reply_markup(reply_markup=markup)
+        except FloodWait as e:
+            _flood_until = time.monotonic() + e.value
+            return schedule_at("progress", key, _flood_until)
+        except Exception:
+            if entry["message"] is not None:
+                return _drop(key)
+    _schedule(key)
+
+
+def schedule_progress(chat_id):
+    playing = db.get(chat_id)
+    track = playing[0] if playing else None
+    for key in list(chatwatches.get(chat_id, ())):
+        if watches[key]["track"] is not track:
+            _drop(key)
+        else:
+            _schedule(key)
+    if track is not None and ("stream", chat_id) not in watches:
+        _add(("stream", chat_id), chat_id, track, None, _stream_markup)
+
+
+def watch_message(chat_id, message, render):
+    playing = db.get(chat_id)
+    if not playing:
+        return
+    _add(("message", message.chat.id, message.id), chat_id, playing[0], message, render)
+
+
+def unwatch_message(message):
+    _drop(("message", message.chat.id, message.id))
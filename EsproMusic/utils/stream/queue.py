@@ -3,7 +3,11 @@ from typing import Union
 
 from EsproMusic.misc import db
 from EsproMusic.utils.formatters import check_duration, seconds_to_min
-from config import autoclean, time_to_seconds
+from EsproMusic.utils.stream.autoclear import retain
+from EsproMusic.utils.stream.clock import start_clock
+from EsproMusic.utils.stream.prefetch import schedule_prefetch
+from EsproMusic.utils.stream.progress import schedule_progress
+from config import time_to_seconds
 
 
 async def put_queue(
@@ -44,7 +48,11 @@ async def put_queue(
             db[chat_id].append(put)
     else:
         db[chat_id].append(put)
-    autoclean.append(file)
+    if db[chat_id][0] is put:
+        start_clock(put)
+    retain(file)
+    schedule_prefetch(chat_id)
+    schedule_progress(chat_id)
 
 
 async def put_queue_index(
@@ -89,3 +97,7 @@ async def put_queue_index(
             db[chat_id].append(put)
     else:
         db[chat_id].append(put)
+    if db[chat_id][0] is put:
+        start_clock(put)
+    schedule_prefetch(chat_id)
+    schedule_progress(chat_id)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from random import randint
 from typing import Union
@@ -12,10 +13,19 @@ from EsproMusic.utils.database import add_active_video_chat, is_active_chat
 from EsproMusic.utils.exceptions import AssistantErr
 from EsproMusic.utils.inline import aq_markup, close_markup, stream_markup
 from EsproMusic.utils.pastebin import LoyBin
+from EsproMusic.utils.stream.autoclear import clear_queue
 from EsproMusic.utils.stream.queue import put_queue, put_queue_index
 from EsproMusic.utils.thumbnails import get_thumb
 
 
+async def _resolve(search, videoid, semaphore):
+    async with semaphore:
+        try:
+            return await YouTube.details(search, videoid)
+        except:
+            return None
+
+
 async def stream(
     _,
     mystic,
@@ -36,83 +46,95 @@ async def stream(
     if streamtype == "playlist":
         msg = f"{_['play_19']}\n\n"
         count = 0
-        for search in result:
-            if int(count) == config.PLAYLIST_FETCH_LIMIT:
-                continue
-            try:
-                (
-                    title,
-                    duration_min,
-                    duration_sec,
-                    thumbnail,
-                    vidid,
-                ) = await YouTube.details(search, False if spotify else True)
-            except:
-                continue
-            if str(duration_min) == "None":
-                continue
-            if duration_sec > config.DURATION_LIMIT:
-                continue
-            if await is_active_chat(chat_id):
-                await put_queue(
-                    chat_id,
-                    original_chat_id,
-                    f"vid_{vidid}",
-                    title,
-                    duration_min,
-                    user_name,
-                    vidid,
-                    user_id,
-                    "video" if video else "audio",
-                )
-                position = len(db.get(chat_id)) - 1
-                count += 1
-                msg += f"{count}. {title[:70]}\n"
-                msg += f"{_['play_20']} {position}\n\n"
-            else:
-                if not forceplay:
-                    db[chat_id] = []
-                status = True if video else None
-                try:
-                    file_path, direct = await YouTube.download(
-                        vidid, mystic, video=status, videoid=True
+        # Look entries up concurrently but consume them in playlist order, so the
+        # first playable track starts while the rest are still resolving.
+        semaphore = asyncio.Semaphore(config.PLAYLIST_RESOLVE_WORKERS)
+        lookups = [
+            asyncio.create_task(
+                _resolve(search, False if spotify else True, semaphore)
+            )
+            for search in result
+        ]
+        try:
+            for lookup in lookups:
+                if int(count) == config.PLAYLIST_FETCH_LIMIT:
+                    break
+                details = await lookup
+                if details is None:
+                    continue
+                title, duration_min, duration_sec, thumbnail, vidid = details
+                if str(duration_min) == "None":
+                    continue
+                if duration_sec > config.DURATION_LIMIT:
+                    continue
+                if await is_active_chat(chat_id):
+                    await put_queue(
+                        chat_id,
+                        original_chat_id,
+                        f"vid_{vidid}",
+                        title,
+                        duration_min,
+                        user_name,
+                        vidid,
+                        user_id,
+                        "video" if video else "audio",
                     )
-                except:
-                    raise AssistantErr(_["play_14"])
-                await Loy.join_call(
-                    chat_id,
-                    original_chat_id,
-                    file_path,
-                    video=status,
-                    image=thumbnail,
-                )
-                await put_queue(
-                    chat_id,
-                    original_chat_id,
-                    file_path if direct else f"vid_{vidid}",
-                    title,
-                    duration_min,
-                    user_name,
-                    vidid,
-                    user_id,
-                    "video" if video else "audio",
-                    forceplay=forceplay,
-                )
-                img = await get_thumb(vidid)
-                button = stream_markup(_, chat_id)
-                run = await app.send_photo(
-                    original_chat_id,
-                    photo=img,
-                    caption=_["stream_1"].format(
-                        f"https://t.me/{app.username}?start=info_{vidid}",
-                        title[:23],
+                    position = len(db.get(chat_id)) - 1
+                    count += 1
+                    msg += f"{count}. {title[:70]}\n"
+                    msg += f"{_['play_20']} {position}\n\n"
+                else:
+                    if not forceplay:
+                        await clear_queue(chat_id)
+                    status = True if video else None
+                    try:
+                        file_path, direct = await YouTube.download(
+                            vidid,
+                            mystic,
+                            video=status,
+                            videoid=True,
+                            chat_id=chat_id,
+                            stream=True,
+                        )
+                    except:
+                        raise AssistantErr(_["play_14"])
+                    await Loy.join_call(
+                        chat_id,
+                        original_chat_id,
+                        file_path,
+                        video=status,
+                        image=thumbnail,
+                    )
+                    await put_queue(
+                        chat_id,
+                        original_chat_id,
+                        file_path if direct else f"vid_{vidid}",
+                        title,
                         duration_min,
                         user_name,
-                    ),
-                    reply_markup=InlineKeyboardMarkup(button),
-                )
-                db[chat_id][0]["mystic"] = run
-                db[chat_id][0]["markup"] = "stream"
+                        vidid,
+                        user_id,
+                        "video" if video else "audio",
+                        forceplay=forceplay,
+                    )
+                    img = await get_thumb(vidid)
+                    button = stream_markup(_, chat_id)
+                    run = await app.send_photo(
+                        original_chat_id,
+                        photo=img,
+                        caption=_["stream_1"].format(
+                            f"https://t.me/{app.username}?start=info_{vidid}",
+                            title[:23],
+                            duration_min,
+                            user_name,
+                        ),
+                        reply_markup=InlineKeyboardMarkup(button),
+                    )
+                    db[chat_id][0]["mystic"] = run
+                    db[chat_id][0]["markup"] = "stream"
+        finally:
+            for lookup in lookups:
+                lookup.cancel()
         if count == 0:
             return
         else:
@@ -139,7 +161,12 @@ async def stream(
         status = True if video else None
         try:
             file_path, direct = await YouTube.download(
-                vidid, mystic, videoid=True, video=status
+                vidid,
+                mystic,
+                videoid=True,
+                video=status,
+                chat_id=chat_id,
+                stream=not await is_active_chat(chat_id),
             )
         except:
             raise AssistantErr(_["play_14"])
@@ -164,7 +191,7 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                await clear_queue(chat_id)
             await Loy.join_call(
                 chat_id,
                 original_chat_id,
@@ -224,7 +251,7 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                await clear_queue(chat_id)
             await Loy.join_call(chat_id, original_chat_id, file_path, video=None)
             await put_queue(
                 chat_id,
@@ -276,7 +303,7 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                await clear_queue(chat_id)
             await Loy.join_call(chat_id, original_chat_id, file_path, video=status)
             await put_queue(
                 chat_id,
@@ -329,7 +356,7 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                await clear_queue(chat_id)
             n, file_path = await YouTube.video(link)
             if n == 0:
                 raise AssistantErr(_["str_3"])
@@ -390,7 +417,7 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                await clear_queue(chat_id)
             await Loy.join_call(
                 chat_id,
                 original_chat_id,
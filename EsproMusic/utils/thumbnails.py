@@ -1,15 +1,26 @@
+import asyncio
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import aiofiles
-import aiohttp
 from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont
 from unidecode import unidecode
-from youtubesearchpython.__future__ import VideosSearch
 
+import config
 from EsproMusic import app
+from EsproMusic.core.http import get_session
+from EsproMusic.platforms._search import search
 from config import YOUTUBE_IMG_URL
 
+# Pillow releases the GIL while resizing, filtering and encoding, so renders
+# run on a few threads, each with its own fonts and prerendered overlay
+_worker = threading.local()
+render_pool = None
+# videoid -> task rendering its thumbnail
+rendering = {}
+
 
 def changeImageSize(maxWidth, maxHeight, image):
     widthRatio = maxWidth / image.size[0]
@@ -29,14 +40,92 @@ def clear(text):
     return title.strip()
 
 
+def _init_worker(name):
+    _worker.arial = ImageFont.truetype("EsproMusic/assets/font2.ttf", 30)
+    _worker.font = ImageFont.truetype("EsproMusic/assets/font.ttf", 30)
+    overlay = Image.new("RGBA", (1280, 720), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.text((1110, 8), name, fill="white", font=_worker.arial)
+    draw.line(
+        [(55, 660), (1220, 660)],
+        fill="white",
+        width=5,
+        joint="curve",
+    )
+    draw.ellipse(
+        [(918, 648), (942, 672)],
+        outline="white",
+        fill="white",
+        width=15,
+    )
+    draw.text(
+        (36, 685),
+        "00:00",
+        (255, 255, 255),
+        font=_worker.arial,
+    )
+    _worker.overlay = overlay
+
+
+def _pool():
+    global render_pool
+    if render_pool is None:
+        render_pool = ThreadPoolExecutor(
+            max_workers=config.THUMB_WORKERS,
+            thread_name_prefix="thumb",
+            initializer=_init_worker,
+            initargs=(unidecode(app.name),),
+        )
+    return render_pool
+
+
+def _render(source, target, title, channel, views, duration):
+    youtube = Image.open(source)
+    image1 = changeImageSize(1280, 720, youtube)
+    image2 = image1.convert("RGBA")
+    background = image2.filter(filter=ImageFilter.BoxBlur(10))
+    enhancer = ImageEnhance.Brightness(background)
+    background = enhancer.enhance(0.5)
+    background.paste(_worker.overlay, (0, 0), _worker.overlay)
+    draw = ImageDraw.Draw(background)
+    draw.text(
+        (55, 560),
+        f"{channel} | {views[:23]}",
+        (255, 255, 255),
+        font=_worker.arial,
+    )
+    draw.text(
+        (57, 600),
+        clear(title),
+        (255, 255, 255),
+        font=_worker.font,
+    )
+    draw.text(
+        (1185, 685),
+        f"{duration[:23]}",
+        (255, 255, 255),
+        font=_worker.arial,
+    )
+    # Chats waiting on the same video never see a half written file
+    background.save(f"{target}.tmp", format="PNG")
+    os.replace(f"{target}.tmp", target)
+
+
 async def get_thumb(videoid):
     if os.path.isfile(f"cache/{videoid}.png"):
         return f"cache/{videoid}.png"
+    task = rendering.get(videoid)
+    if task is None:
+        task = asyncio.ensure_future(_make_thumb(videoid))
+        rendering[videoid] = task
+        task.add_done_callback(lambda _: rendering.pop(videoid, None))
+    return await asyncio.shield(task)
 
+
+async def _make_thumb(videoid):
     url = f"https://www.youtube.com/watch?v={videoid}"
     try:
-        results = VideosSearch(url, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search(url):
             try:
                 title = result["title"]
                 title = re.sub("\W+", " ", title)
@@ -57,64 +146,27 @@ async def get_thumb(videoid):
             except:
                 channel = "Unknown Channel"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(thumbnail) as resp:
-                if resp.status == 200:
-                    f = await aiofiles.open(f"cache/thumb{videoid}.png", mode="wb")
-                    await f.write(await resp.read())
-                    await f.close()
-
-        youtube = Image.open(f"cache/thumb{videoid}.png")
-        image1 = changeImageSize(1280, 720, youtube)
-        image2 = image1.convert("RGBA")
-        background = image2.filter(filter=ImageFilter.BoxBlur(10))
-        enhancer = ImageEnhance.Brightness(background)
-        background = enhancer.enhance(0.5)
-        draw = ImageDraw.Draw(background)
-        arial = ImageFont.truetype("EsproMusic/assets/font2.ttf", 30)
-        font = ImageFont.truetype("EsproMusic/assets/font.ttf", 30)
-        draw.text((1110, 8), unidecode(app.name), fill="white", font=arial)
-        draw.text(
-            (55, 560),
-            f"{channel} | {views[:23]}",
-            (255, 255, 255),
-            font=arial,
-        )
-        draw.text(
-            (57, 600),
-            clear(title),
-            (255, 255, 255),
-            font=font,
-        )
-        draw.line(
-            [(55, 660), (1220, 660)],
-            fill="white",
-            width=5,
-            joint="curve",
-        )
-        draw.ellipse(
-            [(918, 648), (942, 672)],
-            outline="white",
-            fill="white",
-            width=15,
-        )
-        draw.text(
-            (36, 685),
-            "00:00",
-            (255, 255, 255),
-            font=arial,
-        )
-        draw.text(
-            (1185, 685),
-            f"{duration[:23]}",
-            (255, 255, 255),
-            font=arial,
+        session = get_session()
+        async with session.get(thumbnail) as resp:
+            if resp.status == 200:
+                f = await aiofiles.open(f"cache/thumb{videoid}.png", mode="wb")
+                await f.write(await resp.read())
+                await f.close()
+
+        await asyncio.get_running_loop().run_in_executor(
+            _pool(),
+            _render,
+            f"cache/thumb{videoid}.png",
+            f"cache/{videoid}.png",
+            title,
+            channel,
+            views,
+            duration,
         )
         try:
             os.remove(f"cache/thumb{videoid}.png")
         except:
             pass
-        background.save(f"cache/{videoid}.png")
         return f"cache/{videoid}.png"
     except Exception as e:
         print(e)
@@ -1,5 +1,5 @@
 import re
-from os import getenv
+from os import environ, getenv
 
 from dotenv import load_dotenv
 from pyrogram import filters
@@ -53,6 +53,8 @@ SUPPORT_CHAT = getenv("SUPPORT_CHAT", "https://t.me/alpna_updates")
 
 # Set this to True if you want the assistant to automatically leave chats after an interval
 AUTO_LEAVING_ASSISTANT = bool(getenv("AUTO_LEAVING_ASSISTANT", False))
+# Seconds a chat stays idle before its assistant leaves it
+AUTO_LEAVE_TIME = int(getenv("AUTO_LEAVE_TIME", 900))
 
 
 # Get this credentials from https://developer.spotify.com/dashboard
@@ -63,6 +65,59 @@ SPOTIFY_CLIENT_SECRET = getenv("SPOTIFY_CLIENT_SECRET", None)
 # Maximum limit for fetching playlist's track from youtube, spotify, apple links.
 PLAYLIST_FETCH_LIMIT = int(getenv("PLAYLIST_FETCH_LIMIT", 25))
 
+# Playlist entries looked up at the same time while enqueueing
+PLAYLIST_RESOLVE_WORKERS = int(getenv("PLAYLIST_RESOLVE_WORKERS", 5))
+
+# YouTube playlist extraction: threads, ids fetched per page, cached playlists and their lifetime
+PLAYLIST_WORKERS = int(getenv("PLAYLIST_WORKERS", 2))
+PLAYLIST_PAGE_SIZE = int(getenv("PLAYLIST_PAGE_SIZE", 50))
+PLAYLIST_CACHE_SIZE = int(getenv("PLAYLIST_CACHE_SIZE", 500))
+PLAYLIST_CACHE_TTL = int(getenv("PLAYLIST_CACHE_TTL", 3600))
+
+# Number of upcoming queued tracks to download in the background, 0 to disable
+PREFETCH_DEPTH = int(getenv("PREFETCH_DEPTH", 2))
+
+# Maximum number of simultaneous media downloads across all chats
+DOWNLOAD_WORKERS = int(getenv("DOWNLOAD_WORKERS", 4))
+
+# Connection limits of the shared HTTP session, overall and per remote host
+HTTP_POOL_LIMIT = int(getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_PER_HOST = int(getenv("HTTP_POOL_PER_HOST", 10))
+
+# Threads rendering track thumbnails, which also bounds how many render at once
+THUMB_WORKERS = int(getenv("THUMB_WORKERS", 2))
+
+# Parallel byte-range connections per video download (1 disables) and the size of each range
+DOWNLOAD_CONNECTIONS = int(getenv("DOWNLOAD_CONNECTIONS", 4))
+DOWNLOAD_CHUNK_SIZE = int(getenv("DOWNLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+
+# Start playing a YouTube track from the API stream while its file is still downloading
+STREAM_WHILE_DOWNLOADING = bool(getenv("STREAM_WHILE_DOWNLOADING", False))
+
+# Quota of the downloads/ media cache in megabytes and files, 0 for no limit
+MEDIA_CACHE_SIZE = int(getenv("MEDIA_CACHE_SIZE", 2048))
+MEDIA_CACHE_FILES = int(getenv("MEDIA_CACHE_FILES", 500))
+
+# In-memory YouTube search cache size and lifetime in seconds
+YT_CACHE_SIZE = int(getenv("YT_CACHE_SIZE", 5000))
+YT_CACHE_TTL = int(getenv("YT_CACHE_TTL", 21600))
+
+# Lookups after which a video's metadata is also kept in Mongo (0 disables) and for how long
+YT_CACHE_POPULAR_HITS = int(getenv("YT_CACHE_POPULAR_HITS", 3))
+YT_CACHE_PERSIST_TTL = int(getenv("YT_CACHE_PERSIST_TTL", 7 * 86400))
+
+
+# Number of chats whose settings are kept in memory, and for how long (in seconds)
+SETTINGS_CACHE_SIZE = int(getenv("SETTINGS_CACHE_SIZE", 50000))
+SETTINGS_CACHE_TTL = int(getenv("SETTINGS_CACHE_TTL", 3600))
+# Maximum number of chats whose settings are preloaded at startup, 0 to disable
+SETTINGS_PRELOAD_LIMIT = int(getenv("SETTINGS_PRELOAD_LIMIT", SETTINGS_CACHE_SIZE))
+
+
+# Number of chats whose admin list is kept in memory, and for how long (in seconds)
+ADMIN_CACHE_SIZE = int(getenv("ADMIN_CACHE_SIZE", 10000))
+ADMIN_CACHE_TTL = int(getenv("ADMIN_CACHE_TTL", 1800))
+
 
 # Telegram audio and video file size limit (in bytes)
 TG_AUDIO_FILESIZE_LIMIT = int(getenv("TG_AUDIO_FILESIZE_LIMIT", 104857600))
@@ -71,18 +126,30 @@ TG_VIDEO_FILESIZE_LIMIT = int(getenv("TG_VIDEO_FILESIZE_LIMIT", 1073741824))
 
 
 # Get your pyrogram v2 session from @StringFatherBot on Telegram
-STRING1 = getenv("STRING_SESSION", None)
-STRING2 = getenv("STRING_SESSION2", None)
-STRING3 = getenv("STRING_SESSION3", None)
-STRING4 = getenv("STRING_SESSION4", None)
-STRING5 = getenv("STRING_SESSION5", None)
+# Any number of assistants: STRING_SESSION (or STRING_SESSION1), STRING_SESSION2, ...
+STRING_SESSIONS = {}
+for _key, _value in environ.items():
+    _match = re.fullmatch(r"STRING_SESSION(\d*)", _key)
+    if _match and _value:
+        _number = int(_match.group(1) or 1)
+        if _number in STRING_SESSIONS:
+            raise SystemExit(
+                f"[ERROR] - Assistant {_number} is set twice, use either STRING_SESSION or STRING_SESSION1."
+            )
+        STRING_SESSIONS[_number] = _value
+STRING_SESSIONS = dict(sorted(STRING_SESSIONS.items()))
+
+# Maximum concurrent voice chats per assistant before new chats go elsewhere, 0 for no limit
+ASSISTANT_MAX_CALLS = int(getenv("ASSISTANT_MAX_CALLS", 0))
+
+# Seconds allowed for each assistant to start or answer a ping
+ASSISTANT_START_TIMEOUT = int(getenv("ASSISTANT_START_TIMEOUT", 60))
+ASSISTANT_PING_TIMEOUT = int(getenv("ASSISTANT_PING_TIMEOUT", 10))
 
 
 BANNED_USERS = filters.user()
-adminlist = {}
 lyrical = {}
 votemode = {}
-autoclean = []
 confirmer = {}
 
 